@@ -3,44 +3,133 @@
 
 # The following program uses alpha-beta pruning to evaluate a given position
 # in the Dobutsu Shogi game. To ensure that the program does not always give
-# the same replies to moves (when more than one game is played), the children
-# of the root node of the search tree of this algorithm are randomly permuted
-# before the beginning of alpha-beta pruning. During the execution of alpha-
-# beta pruning, the order of the children of the root node (determined before
-# the start of alpha-beta pruning) is fixed.
-
-# The program always assumes the role of Player B
-# and is the maximizing player (player who wants to maximize his/her alpha
-# score) in the below program. The minimizing player (player who wants to
-# minimize his/her beta score) is always Player A. The evaluation function is
-# scored as follows.
-
-# Player A wins (in a way specified by the capturewin and noncapture win
-# functions in board.py) : -1
-# Player B wins (in a way specified by the capturewin and noncapture win
-# functions in board.py) : 1
+# the same replies to moves (when more than one game is played), the search
+# finds all of the children of the root node of the search tree that have the
+# best score, and one of them is chosen at random. The search is done in such
+# a way that the alpha-beta pruning algorithm is not compromised.
+
+# The program assumes the role of Player B when alphabeta is called (unless
+# it is given the other side), and of the given side when bestmove is called.
+# The search itself is written from the point of view of the side to move (a
+# negamax search): the score of a position is the score for the player whose
+# turn it is, and the score of a position for one player is the negative of
+# its score for the other player. The evaluation function is scored as
+# follows.
+
+# The player to move has won (in a way specified by the capturewin and
+# noncapturewin functions in board.py) : 1
+# The other player has won : -1
 
 # In addition to using the alpha-beta pruning algorithm, the following is
 # done to skew scores when not at the root node (root node of the search tree
 # for alpha beta pruning).
 
-# If neither Player A nor Player B is considered to have won, then add
-# 0.01 to the score if Player B has at least two more pieces than Player A
-# and subtract 0.01 from the score in Player A has at least two more pieces
-# than Player A.
+# If neither player is considered to have won, then add 0.01 to the score if
+# the player to move has at least two more pieces than the other player and
+# subtract 0.01 from the score if the other player has at least two more
+# pieces than the player to move.
 
 # So for instance, if the search depth is set to 6 and if a candidate move for
 # Player B is a sure win within six moves for Player B but involves Player B
 # having at least two fewer pieces than Player A for the rest of the game, then
 # the score for that candidate move would be at least: 1 - 5 * 0.01 = 0.95.
 
+# Scores are integers in the program: the scores 1 and 0.01 above are
+# winscore and skewunit below, so that scores are compared exactly (the null
+# windows of the search below depend on it). Since the skew of a position is
+# added to the best score of its children, alpha and beta are shifted by the
+# skew before they are passed to the children, so that the scores found are
+# exactly the scores described above.
+
 # The ideal search depth for this program would be between 3 and 7 inclusive.
 
+# The positions found by the search are remembered in a transposition table
+# (see transposition.py). Before searching a position, the search looks it up
+# in the table. If it was already searched at least as deeply, the stored
+# score is reused whenever it decides the position for the current alpha and
+# beta, and otherwise the stored best move is searched first.
+
+# The search works on the Position class of position.py rather than on the
+# dictionary described in board.py. Each move is made on the Position itself
+# and taken back when its subtree has been searched (see the make and unmake
+# functions of the Position), so no position is ever copied during the
+# search.
+
+# The search is a principal variation search. The first move of each position
+# is searched with the full window (alpha, beta). Every other move is first
+# searched with a null window (alpha, alpha + 1), which only tells whether the
+# move is better than the best move so far, and is searched again with the
+# full window if it is. With a good move first, most moves are only searched
+# with a null window, which prunes far more than the full window.
+
+# Alpha-beta pruning prunes the most when the best move of each position is
+# searched first, so the moves of each position are ordered as follows (see
+# ordermoves): the best move stored in the transposition table, captures
+# (captures of the lion first, then captures of more valuable pieces first),
+# the killer moves of the ply (the last two moves that were not captures and
+# made the search of a position at the same ply stop early), and then the
+# other moves and drops, best first according to the history heuristic (how
+# often, and how deeply, each move has made the search stop early).
+
+# If a tablebase is given (see tablebase.py), then positions it covers are
+# not searched: their exact result is looked up instead, at the root and at
+# every other node.
+
+# When the search deepens one ply at a time (see searchposition), each search
+# starts with a narrow window around the score of the previous search (an
+# aspiration window), and is repeated with a full window on the side where
+# the score falls outside of it.
+
+# When the depth runs out, the search does not stop in the middle of an
+# exchange of pieces or just before a lion is captured or reaches the
+# furthest rank: a quiescence search (see quiesce) goes on with the captures
+# and the moves of the lion to the furthest rank only, until the position is
+# quiet. The player to move may also stop there (stand pat) and keep the
+# score of the position as it is, unless its lion is attacked, in which case
+# it must save the lion, or the opponent's lion can reach the furthest rank
+# safely, in which case it must stop it. The quiescence search can be turned
+# off (to compare the search with and without it), and the search then stops
+# at the depth with the score skew.
+
+# Where the search stops (when the depth has run out, and when the player to
+# move stands pat in the quiescence search), the static evaluation of the
+# position (see evaluate.py) is added to the score skew: the difference in
+# material on the board and in hand, in the mobility of the lions and in the
+# advancement of the chicks. It can also be turned off.
+
+# A game that reaches the same position three times is a draw (see
+# repetitions in movegen.py), so the search scores a position as a draw (0)
+# when it repeats a position of the path from the root (if repeating it were
+# good for either player, that player could repeat the same moves until the
+# game is drawn), or when it would be the third occurrence of a position of
+# the game so far. A position that occurred only once in the game is not a
+# draw by itself: the game may go through it again. The search does not go
+# any further from a repeated position, so it does not waste nodes going
+# round in a cycle of moves. The keys of the path (see position.py) are kept
+# in a set and the keys of the game in a dictionary of counts, so a
+# repetition is found in constant time at every node. The quiescence search
+# is not checked: most of its lines capture a piece or end the game within a
+# few moves, and the others are cut at maxdepth.
+
+# The score of a repeated position depends on how the search got there, not
+# only on the position, so a node whose subtree found a repetition is not
+# stored in the transposition table (which may be kept for the next moves of
+# the game, or shared by several processes, see parallel.py and ponder.py).
+
+# If a Statistics object (see below) is given to the search, then the search
+# fills it in with counts of what it did. Without one, the search only checks
+# that it is None at a few places in each node.
+
 import math
 import random
+import time
 
-from board import capturewin, noncapturewin, selection, piecemajority
-from board_hardware import perform
+from evaluate import evaluate
+from movegen import legalmoves, tacticalmoves, winner, attacked, safetries, \
+                    repetitions
+from position import frompieces, topieces, L
+from transposition import TranspositionTable, exact, lowerbound, upperbound, \
+                          probeposition, storeposition
 
 # Player B
 #    1  2  3
@@ -53,131 +142,584 @@ from board_hardware import perform
 # Constants indicating the players involved.
 a, b = 'A', 'B'
 
-# There are three functions below that run this program. alphabeta returns an
-# optimal move (move = moving a piece or dropping a piece) whereas maximizer
-# and minimizer return integers representing scores. alphabeta is used to
-# perform alpha-beta pruning at the root node of the search tree. maximizer
-# and minimizer are run when performing alpha-beta pruning at the other nodes.
-
-# Don't directly call maximizer or minimizer, call alphabeta. Maximizer and
-# minimizer recursively call each other and run when alphabeta is called.
-# alphabeta has additional code for randomizing optimal moves. In alphabeta,
-# the randomization is performed in such a way that the alpha-beta pruning
-# algorithm is not compromised.
-
-# This function represents the maximizing player, Player B, in the modified
-# alpha-beta pruning algorithm (alpha-beta pruning + skewing scores as
-# described above).
-
-def maximizer(pieces, depth, alpha, beta):
-
-    # Skew the score if one side has at least two more pieces.
-    skew = 0
-    majority = piecemajority(pieces)
-    if majority == a : skew = -0.01
-    elif majority == b : skew = 0.01
-
-    # If one side wins, provide a score. Otherwise, if the depth
-    # limit has been reached, provide the score skew.
-    if capturewin(pieces) == b : return 1
-    elif noncapturewin(pieces) == b : return 1
-    elif capturewin(pieces) == a : return -1
-    elif noncapturewin(pieces) == a : return -1
-    elif depth == 0 : return skew
-
-    # Determine all candidate moves for Player B at this node.
-    selected = selection(b, pieces)
-    possibilities = []
-
-    for action in selected:
-        possibilities.append(perform(action, pieces))
-
-    possibilities = [i for i in possibilities if i is not None]
-
-    # Apply alpha-beta pruning to this node.
-    maximinlist = []
-
-    for possibility in possibilities:
-        value = minimizer(possibility, depth - 1, alpha, beta)
-        maximinlist.append(value)
-        alpha = max(alpha, value)
-        if beta <= alpha:
-            break
-
-    return max(maximinlist) + skew
-
-# This function represents the minimizing player, Player A, in the modified
-# alpha-beta pruning algorithm (alpha-beta pruning + skewing scores as
-# described above).
-
-def minimizer(pieces, depth, alpha, beta):
+winscore = 10000
+skewunit = 100
+
+# The half-width of the aspiration windows.
+aspiration = skewunit
+
+# The deepest search done when a time budget is given and no depth is given.
+maxdepth = 64
+
+# The value of each type of piece, in the order L, G, E, C, H (see
+# position.py), used to order captures.
+values = (100, 4, 3, 1, 5)
+
+# A search that is given a time budget is stopped by raising Timeout from the
+# node that finds the time budget exhausted. The search state below holds the
+# transposition table, the time at which the search must stop (None if it is
+# not given a time budget), the number of nodes searched, the principal
+# variations found (pv[ply] is the best line found from the position ply
+# moves away from the root), the killer moves of each ply and the history
+# scores of the moves of each side, the tablebase (None if there is none)
+# and an event (threading.Event or multiprocessing.Event, None if there is
+# none) that stops the search like Timeout when it is set, and the Statistics
+# to fill in (None if there are none), whether the quiescence search and the
+# static evaluation are on, the number of times each key of history (the
+# list of the keys of the positions of the game) occurs in it, the set of the
+# keys of the path from the root to the current node and the number of
+# repetitions found so far. It is passed to every node.
+# The clock and the event are only read once every 1024 nodes.
+
+class Timeout(Exception):
+    pass
+
+class Search:
+
+    def __init__(self, table, deadline = None, tablebase = None, stop = None,
+                 stats = None, quiescence = True, evaluation = True,
+                 history = None):
+        self.table = table
+        self.deadline = deadline
+        self.tablebase = tablebase
+        self.stop = stop
+        self.stats = stats
+        self.quiescence = quiescence
+        self.evaluation = evaluation
+        self.counts = {}
+        for key in history or ():
+            self.counts[key] = self.counts.get(key, 0) + 1
+        self.path = set()
+        self.repeats = 0
+        self.nodes = 0
+        self.pv = [[] for ply in range(maxdepth + 1)]
+        self.killers = [[None, None] for ply in range(maxdepth + 1)]
+        self.history = [{}, {}]
+
+    # Count a node, and stop the search if the time budget is exhausted or if
+    # the search is asked to stop.
+    def tick(self):
+        self.nodes += 1
+        if not self.nodes & 1023:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise Timeout
+            if self.stop is not None and self.stop.is_set():
+                raise Timeout
+
+# The statistics of a search: the number of nodes and of leaves (nodes that
+# are not searched any deeper: the depth is reached or a player has won)
+# searched at each ply from the root, the number of cutoffs (nodes whose
+# search stops early because a move is good enough) and how many of them
+# happen at the first move searched, the number of lookups in the
+# transposition table and how many of them find the position, and for each
+# iteration of the deepening (see searchposition) the tuple (depth, nodes,
+# seconds), where nodes is the number of nodes of that iteration and seconds
+# the time since the start of the search.
+
+class Statistics:
+
+    def __init__(self):
+        self.nodes = [0] * (maxdepth + 1)
+        self.leaves = [0] * (maxdepth + 1)
+        self.cutoffs = 0
+        self.firstcutoffs = 0
+        self.probes = 0
+        self.hits = 0
+        self.iterations = []
+
+    # Returns the effective branching factor of each iteration: the number
+    # of nodes of the iteration divided by that of the iteration before.
+    def branching(self):
+        return [(depth, nodes / previous[1] if previous[1] else None)
+                for previous, (depth, nodes, seconds)
+                in zip(self.iterations, self.iterations[1:])]
+
+    # Returns the statistics as lines of text.
+    def report(self):
+        lines = ['Depth      Nodes    Seconds  Branching']
+        factors = dict(self.branching())
+        for depth, nodes, seconds in self.iterations:
+            factor = factors.get(depth)
+            lines.append('%5d %10d %10.3f %10s' % (depth, nodes, seconds,
+                         '%.2f' % factor if factor is not None else '-'))
+        lines.append('Ply        Nodes     Leaves')
+        for ply in range(maxdepth + 1):
+            if self.nodes[ply]:
+                lines.append('%5d %10d %10d' % (ply, self.nodes[ply],
+                                                self.leaves[ply]))
+        rate = lambda part, whole : '%.1f%%' % (100 * part / whole) \
+                                    if whole else '-'
+        lines.append('Cutoffs: ' + str(self.cutoffs) + ' (first move: '
+                     + rate(self.firstcutoffs, self.cutoffs) + ')')
+        lines.append('Table lookups: ' + str(self.probes) + ' (found: '
+                     + rate(self.hits, self.probes) + ')')
+        return lines
+
+# Returns the score skew of a Position for the player to move: skewunit if
+# the player to move has at least two more pieces than the other player,
+# -skewunit if the other player has at least two more pieces, and 0 otherwise
+# (see the piecemajority function in board.py).
+
+def skewscore(position):
+    difference = position.count(position.side) \
+                 - position.count(1 - position.side)
+    if difference >= 2 : return skewunit
+    elif difference <= -2 : return -skewunit
+    return 0
+
+# Returns the score of a result (result, distance) given by the probe function
+# of a tablebase: a win in d ply is worth winscore - d and a loss in d ply is
+# worth -winscore + d (a quicker win is better), and a draw is worth 0.
+
+def tablebasescore(result, distance):
+    if result == 0 : return 0
+    return result * (winscore - distance)
+
+# Sorts the list of moves of the Position, which is ply moves away from the
+# root, in the order described above. hint is the move to search first.
+
+def ordermoves(position, moves, hint, ply, search):
+    cells = position.cells
+    killers = search.killers[ply]
+    history = search.history[position.side]
+
+    def priority(move):
+        if move == hint : return 1 << 42
+        occupant = cells[move[2]]
+        if occupant != -1:
+            return (1 << 41) + 1000 * values[occupant % 5] - values[move[0]]
+        if move == killers[0] : return (1 << 40) + 1
+        if move == killers[1] : return 1 << 40
+        return history.get(move, 0)
+
+    moves.sort(key = priority, reverse = True)
+
+# Records that the move, which is not a capture, made the search of a
+# position ply moves away from the root stop early with depth ply left to
+# search.
+
+def recordcutoff(position, move, depth, ply, search):
+    killers = search.killers[ply]
+    if move != killers[0]:
+        killers[1] = killers[0]
+        killers[0] = move
+    history = search.history[position.side]
+    history[move] = history.get(move, 0) + depth * depth
+
+# This function returns the score of the Position for the player to move,
+# searching depth more ply. The search is ply moves away from the root. The
+# Position is left as it was found. A player without a legal move loses.
+
+def negamax(position, depth, alpha, beta, ply, search):
+    if depth <= 0 and search.quiescence:
+        return quiesce(position, alpha, beta, ply, search)
+    search.tick()
+    table = search.table
+    stats = search.stats
+    search.pv[ply] = []
+    if stats is not None : stats.nodes[ply] += 1
+
+    # If one side wins, provide a score.
+    win = winner(position)
+    if win is not None:
+        if stats is not None : stats.leaves[ply] += 1
+        return winscore if win == position.side else -winscore
+
+    # If the position repeats a position of the path, or has occurred twice
+    # in the game already, then it is a draw.
+    key = position.key
+    if key in search.path or search.counts.get(key, 0) >= repetitions - 1:
+        search.repeats += 1
+        if stats is not None : stats.leaves[ply] += 1
+        return 0
+
+    # If the position is in the tablebase, then its score is known.
+    if search.tablebase is not None:
+        found = search.tablebase.probe(position)
+        if found is not None : return tablebasescore(*found)
 
     # Skew the score if one side has at least two more pieces.
-    skew = 0
-    majority = piecemajority(pieces)
-    if majority == a : skew = -0.01
-    elif majority == b : skew = 0.01
-
-    # If one side wins, provide a score. Otherwise, if the depth
-    # limit has been reached, provide the score skew.
-    if capturewin(pieces) == a : return -1
-    elif noncapturewin(pieces) == a : return -1
-    elif capturewin(pieces) == b : return 1
-    elif noncapturewin(pieces) == b : return 1
-    elif depth == 0 : return skew
-
-    # Determine all candidate moves for Player A at this node.
-    selected = selection(a, pieces)
-    possibilities = []
-
-    for action in selected:
-        possibilities.append(perform(action, pieces))
-
-    possibilities = [i for i in possibilities if i is not None]
-
-    # Apply alpha-beta pruning to this node.
-    minimaxlist = []
-
-    for possibility in possibilities:
-        value = maximizer(possibility, depth - 1, alpha, beta)
-        minimaxlist.append(value)
-        beta = min(beta, value)
-        if beta <= alpha:
+    skew = skewscore(position)
+    if depth <= 0:
+        if stats is not None : stats.leaves[ply] += 1
+        return skew + standpat(position, search)
+
+    # Look up this node in the transposition table.
+    entry = probeposition(table, position)
+    if stats is not None:
+        stats.probes += 1
+        stats.hits += entry is not None
+    hint = None
+    if entry is not None:
+        hint = entry[4]
+        if entry[1] >= depth:
+            if entry[2] == exact : return entry[3]
+            if entry[2] == lowerbound and entry[3] >= beta : return entry[3]
+            if entry[2] == upperbound and entry[3] <= alpha : return entry[3]
+
+    # Determine all legal moves at this node, in the order described above.
+    moves = legalmoves(position)
+    if not moves : return -winscore
+    ordermoves(position, moves, hint, ply, search)
+
+    # Apply principal variation search to this node, with the window shifted
+    # by the skew.
+    low, high = alpha - skew, beta - skew
+    best, bestmove = -math.inf, None
+    repeats = search.repeats
+    search.path.add(key)
+
+    for move in moves:
+        undo = position.make(move)
+        if bestmove is None:
+            score = -negamax(position, depth - 1, -high, -low, ply + 1,
+                             search)
+        else:
+            score = -negamax(position, depth - 1, -low - 1, -low, ply + 1,
+                             search)
+            if low < score < high:
+                score = -negamax(position, depth - 1, -high, -low, ply + 1,
+                                 search)
+        position.unmake(undo)
+
+        if score > best:
+            best, bestmove = score, move
+            if score > low:
+                low = score
+                search.pv[ply] = [move] + search.pv[ply + 1]
+                if low >= high:
+                    if position.cells[move[2]] == -1:
+                        recordcutoff(position, move, depth, ply, search)
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        stats.firstcutoffs += move is moves[0]
+                    break
+
+    search.path.discard(key)
+    value = best + skew
+
+    # Record the result in the transposition table, unless it depends on a
+    # repetition.
+    if search.repeats == repeats:
+        if value <= alpha : flag = upperbound
+        elif value >= beta : flag = lowerbound
+        else : flag = exact
+        storeposition(table, position, depth, flag, value, bestmove)
+
+    return value
+
+# Returns the score of standing pat in the Position (without the score skew):
+# its static evaluation, or 0 if the static evaluation is off.
+
+def standpat(position, search):
+    return evaluate(position) if search.evaluation else 0
+
+# This function returns the score of the Position for the player to move,
+# like negamax when the depth has run out: the score is the score skew, plus
+# the best score of the captures and the moves of the lion to the furthest
+# rank if one of them is better than standing pat (see standpat), or plus the
+# best score of the moves that save the lion if the lion is attacked (a
+# player whose lion cannot be saved loses). The player to move cannot stand
+# pat either when the opponent's lion can reach the furthest rank safely on
+# its next move (see safetries in movegen.py): it must capture, win or stop
+# the try with a move that attacks the squares of the try. The lion only
+# moves without capturing to squares that the opponent does not attack (see
+# tacticalmoves in movegen.py), so such a move never attacks the other lion
+# (the lions would attack each other). Most lines end with a capture or the
+# end of the game within a few moves, and a line that goes on stopping tries
+# is cut at maxdepth. The results are not stored in the transposition table.
+
+def quiesce(position, alpha, beta, ply, search):
+    search.tick()
+    stats = search.stats
+    search.pv[ply] = []
+    if stats is not None : stats.nodes[ply] += 1
+
+    win = winner(position)
+    if win is not None or ply >= maxdepth:
+        if stats is not None : stats.leaves[ply] += 1
+        if win is None:
+            return skewscore(position) + standpat(position, search)
+        return winscore if win == position.side else -winscore
+
+    if search.tablebase is not None:
+        found = search.tablebase.probe(position)
+        if found is not None : return tablebasescore(*found)
+
+    skew = skewscore(position)
+    low, high = alpha - skew, beta - skew
+    side = position.side
+    escape = attacked(position, position.masks[side][L].bit_length() - 1,
+                      1 - side)
+    threat = 0 if escape else safetries(position, 1 - side)
+
+    if escape or threat:
+        best = -winscore - skew
+    else:
+        best = standpat(position, search)
+        if best >= high:
+            if stats is not None : stats.leaves[ply] += 1
+            return best + skew
+        low = max(low, best)
+
+    moves = tacticalmoves(position, escape, threat)
+    if not moves:
+        if stats is not None : stats.leaves[ply] += 1
+        return best + skew
+    ordermoves(position, moves, None, ply, search)
+
+    for move in moves:
+        undo = position.make(move)
+        score = -quiesce(position, -high, -low, ply + 1, search)
+        position.unmake(undo)
+
+        if score > best:
+            best = score
+            if score > low:
+                low = score
+                search.pv[ply] = [move] + search.pv[ply + 1]
+                if low >= high:
+                    if stats is not None:
+                        stats.cutoffs += 1
+                        stats.firstcutoffs += move is moves[0]
+                    break
+
+    return best + skew
+
+# This function applies principal variation search to the root node: it
+# searches the given moves in order with the window (alpha, beta), and
+# returns the best score found (without the skew of the root, which does not
+# change which move is best). Every time a move is found to be the best so
+# far, its score and principal variation are recorded in search.score,
+# search.pv[0] and search.ties, so that they are available if the search is
+# stopped by Timeout.
+
+# If ties is True, then the search also finds all of the moves whose score is
+# equal to the best score (a null window just below the best score so far
+# tells whether a move is at least as good), and search.ties is the list of
+# the principal variations of all of these moves. Otherwise search.ties only
+# holds the principal variation of the best move.
+
+def rootsearch(position, moves, depth, alpha, beta, search, ties = False):
+    best = -math.inf
+    search.pv[0] = []
+    search.ties = []
+
+    for move in moves:
+        undo = position.make(move)
+        if best == -math.inf:
+            score = -negamax(position, depth - 1, -beta, -alpha, 1, search)
+        else:
+            # The null window is (alpha, alpha + 1), or (alpha - 1, alpha)
+            # when moves as good as the best move are looked for.
+            scout = alpha - 1 if ties and search.ties else alpha
+            score = -negamax(position, depth - 1, -scout - 1, -scout, 1,
+                             search)
+            if scout < score < beta:
+                score = -negamax(position, depth - 1, -beta, -scout, 1,
+                                 search)
+        position.unmake(undo)
+
+        if score > best:
+            best = score
+            if score > alpha:
+                alpha = score
+                search.pv[0] = [move] + search.pv[1]
+                search.ties = [search.pv[0]]
+                search.score = score
+                if alpha >= beta:
+                    break
+        elif ties and score == best and search.ties:
+            search.ties.append([move] + search.pv[1])
+
+    return best
+
+# Returns one of the principal variations in ties: the first one, or one
+# chosen at random if randomize is True.
+
+def choose(ties, randomize):
+    return random.choice(ties) if randomize else ties[0]
+
+# Returns (score, [move]) for a Position covered by the tablebase, where move
+# is the move with the best result in the tablebase: the quickest win if
+# there is one, otherwise a draw, otherwise the slowest loss. Capturing the
+# opponent's lion wins at once.
+
+def tablebasemove(position, tablebase, randomize = False):
+    scored = []
+    for move in legalmoves(position):
+        if position.cells[move[2]] % 5 == L:
+            scored.append((winscore, move))
+            continue
+        undo = position.make(move)
+        scored.append((-tablebasescore(*tablebase.probe(position)), move))
+        position.unmake(undo)
+
+    score = max(score for score, move in scored)
+    ties = [[move] for value, move in scored if value == score]
+    return (score, choose(ties, randomize))
+
+# Returns (score, pv) for the side to move in the given Position: the score
+# of the Position and the principal variation (the list of moves, see
+# movegen.py, that the search expects to be played, starting with the best
+# move). The search deepens one ply at a time up to depth ply, and if
+# movetime (a number of milliseconds) is given, it stops when the time runs
+# out (up to maxdepth ply if depth is None). The principal variation returned
+# is that of the last search that was completed, or of the last search that
+# was stopped if that search already found the best move of the search before
+# it (each search starts with that move, so any better move it finds is a
+# better choice). A search that finds a win or a loss ends the deepening
+# early. If randomize is True, the best move is chosen at random among the
+# moves with the best score. The parameter table is the transposition table
+# to use (see transposition.py). If the Position is covered by the given
+# tablebase, then the move is chosen from the tablebase without searching
+# (see tablebasemove). If the event stop is given, then the search also stops
+# as soon as the event is set. The number of nodes searched is left in
+# searchposition.nodes. If a Statistics object is given, then the search
+# fills it in. If quiescence is False, then the quiescence search is off, and
+# if evaluation is False, then the static evaluation is off. history is the
+# list of the keys of the positions of the game so far (the Position itself
+# may be included), which are draws if the search reaches them for the third
+# time (see repetitions in movegen.py).
+
+def searchposition(position, depth = None, movetime = None, table = None,
+                   randomize = False, tablebase = None, stop = None,
+                   stats = None, quiescence = True, evaluation = True,
+                   history = None):
+
+    if tablebase is not None and tablebase.probe(position) is not None:
+        return tablebasemove(position, tablebase, randomize)
+
+    # Unless a transposition table is given (to keep what was learned between
+    # moves of a game), use a new one for this search.
+    if table is None : table = TranspositionTable()
+    table.newsearch()
+
+    start = time.monotonic()
+    deadline = None
+    if movetime is not None : deadline = start + movetime / 1000
+    search = Search(table, deadline, tablebase, stop, stats, quiescence,
+                    evaluation, history)
+    search.path.add(position.key)
+    searchposition.nodes = previous = 0
+
+    position = position.copy()
+    moves = legalmoves(position)
+    if not moves : return (-winscore, [])
+
+    entry = probeposition(table, position)
+    score, pv = None, [entry[4] if entry is not None else None]
+
+    for ply in range(1, (depth or maxdepth) + 1):
+
+        # Search the best move of the previous search first.
+        ordermoves(position, moves, pv[0], 0, search)
+
+        # Search with an aspiration window around the previous score, unless
+        # the previous score was a win or a loss.
+        if score is None or abs(score) >= winscore // 2:
+            alpha, beta = -math.inf, math.inf
+        else:
+            alpha, beta = score - aspiration, score + aspiration
+
+        try:
+            while True:
+                result = rootsearch(position, moves, ply, alpha, beta, search,
+                                    randomize)
+                if result <= alpha : alpha = -math.inf
+                elif result >= beta : beta = math.inf
+                else : break
+        except Timeout:
+            if search.ties:
+                score, pv = search.score, choose(search.ties, randomize)
             break
 
-    return min(minimaxlist) + skew
+        score, pv = result, choose(search.ties, randomize)
+        if stats is not None:
+            stats.iterations.append((ply, search.nodes - previous,
+                                     time.monotonic() - start))
+        previous = search.nodes
+        if abs(score) >= winscore // 2 : break
+
+    # If the time ran out before any move was searched, then play the first
+    # move (the score is None in that case).
+    if pv[0] not in moves : pv = [moves[0]]
+    searchposition.nodes = search.nodes
+
+    return (score, pv)
+
+# Returns (score, pv) for the side to move in the given Position, like
+# searchposition (with randomization), from the opening book, the pool of
+# processes, the Ponderer or a search, as described for alphabeta below. The
+# score is None when the move comes from the book.
+
+def playposition(position, depth, table = None, movetime = None,
+                 tablebase = None, pool = None, book = None, stats = None,
+                 ponder = None, history = None):
+
+    move = book.choose(position) if book is not None else None
+    if move is not None : return (None, [move])
+
+    if pool is not None:
+        score, pv = pool.search(position, depth, movetime, history)
+    elif ponder is not None:
+        score, pv = ponder.search(position, depth, movetime, stats, history)
+    else:
+        score, pv = searchposition(position, depth, movetime, table,
+                                   randomize = True, tablebase = tablebase,
+                                   stats = stats, history = history)
+
+    if ponder is not None and pool is None:
+        following = position.copy()
+        following.make(pv[0])
+        ponder.start(following, pv[1:], depth,
+                     list(history or ()) + [following.key])
+    return (score, pv)
+
+# Returns (move, score) for the given side ('A' or 'B') to move in the
+# position given by the dictionary described in board.py, where move is a
+# move as in movegen.py (see command in board_input.py to write it) and score
+# is the score of the move for that side (None if the move comes from the
+# opening book). The other parameters are those of alphabeta below. The same
+# search plays either side, so an analysis of positions for Player A does not
+# have to turn the board around first.
+
+def bestmove(pieces, side, depth, table = None, movetime = None,
+             tablebase = None, pool = None, book = None, stats = None,
+             ponder = None, history = None):
+    score, pv = playposition(frompieces(pieces, side), depth, table, movetime,
+                             tablebase, pool, book, stats, ponder, history)
+    return (pv[0], score)
 
 # Call this function when running the modified alpha-beta pruning algorithm
 # (alpha-beta pruning + skewing scores as described above + move randomization).
 # Depth should be at least 1. The data structure this function returns is the
 # data structure described in board.py that represents the game board and the
-# pieces.
-
-def alphabeta(pieces, depth, alpha = -math.inf, beta = +math.inf):
-
-    if depth <= 0 : return
-
-    selected = selection(b, pieces)
-    # Randomly permute the children of the root node before alpha-beta
-    # pruning begins.
-    random.shuffle(selected)
-    possibilities = []
-
-    # Determine all candidate moves for Player B.
-    for action in selected:
-        possibilities.append(perform(action, pieces))
-
-    possibilities = [i for i in possibilities if i is not None]
-
-    # Apply alpha-beta pruning to the root node.
-    maximinlist = []
-
-    for possibility in possibilities:
-        value = minimizer(possibility, depth - 1, alpha, beta)
-        maximinlist.append(value)
-        alpha = max(alpha, value)
-
-    maxvalue = max(maximinlist)
-    maxindex = maximinlist.index(maxvalue)
-
-    return possibilities[maxindex]
+# pieces after the move of side (Player B by default). The parameter table is
+# the transposition table to use (see transposition.py). A table kept from one
+# move of a game to the next saves searching positions that were already
+# searched for the previous move. If movetime (a number of milliseconds) is
+# given, then the search stops when the time runs out (see searchposition). If
+# a tablebase is given (see tablebase.py), then the positions it covers are
+# looked up instead of searched. If a pool of processes is given (see
+# parallel.py), then the moves of the root node are searched in parallel by
+# the pool, and the move is not randomized. If an opening book is given (see
+# book.py), then a move of the book is played without searching when the
+# position is in the book. If a Statistics object is given, then the search
+# fills it in (except when a pool searches). If a Ponderer is given (see
+# ponder.py), then the search uses the result of pondering or its
+# transposition table, and pondering starts again after the move (unless a
+# pool searches). history is the list of the keys of the positions of the
+# game so far (see searchposition).
+
+def alphabeta(pieces, depth, table = None, movetime = None, tablebase = None,
+              pool = None, book = None, stats = None, ponder = None, side = b,
+              history = None):
+
+    if movetime is None and depth <= 0 : return
+
+    position = frompieces(pieces, side)
+    score, pv = playposition(position, depth, table, movetime, tablebase, pool,
+                             book, stats, ponder, history)
+    position.make(pv[0])
+    return topieces(position)
@@ -0,0 +1,189 @@
+# The following program analyzes many positions at once (for instance, the
+# positions of a collection of game logs) with the search of alphabeta.py,
+# on a pool of worker processes, and writes one line of JSON for each
+# position as soon as its analysis is finished.
+
+# Each line of the input is a JSON object of the following form, where pieces
+# is the dictionary described in board.py (squares are written as lists [i, j]
+# of two numbers), side is the side to move ('A' or 'B', 'B' by default) and
+# id is any value identifying the position (the line number by default).
+
+# {"id": ..., "pieces": {...}, "side": "B"}
+
+# The position can also be given as the text described in notation.py, which
+# includes the side to move.
+
+# {"id": ..., "position": "GLE/1C1/1c1/elg B -"}
+
+# Each line of the output is a JSON object of the following form, where move
+# is the best move and pv the principal variation, written as the commands
+# described in board_input.py, score is the score of the position for the
+# side to move (see alphabeta.py), nodes is the number of nodes searched and
+# time is the number of seconds the analysis took. The lines are written in
+# the order in which the analyses finish, not in the order of the input.
+
+# {"id": ..., "move": "mc3222", "score": 100, "pv": [...], "nodes": ...,
+#  "time": ...}
+
+# Only a bounded number of positions are handed to the pool at any time, so
+# that the memory used stays the same however long the input is.
+
+# With --static, the positions are not searched: the output only gives the
+# score of each position where the search would stop, that is, its score
+# skew plus its static evaluation (see evaluate.py), in the order of the
+# input. The positions are evaluated chunk at a time with evaluatebatch, in
+# this process.
+
+# {"id": ..., "score": 27}
+
+# Usage: python batch.py positions.jsonl --depth 6 --workers 4 > results.jsonl
+#        python batch.py positions.jsonl --static > scores.jsonl
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from alphabeta import searchposition, skewscore, winscore
+from board_input import command
+from evaluate import evaluatebatch
+from movegen import winner
+from notation import fromtext
+from position import frompieces
+from tablebase import Tablebase
+from transposition import TranspositionTable
+
+# The state of a worker process: the transposition table (kept from one
+# position to the next, see transposition.py) and the tablebase (None if
+# there is none).
+worker = {}
+
+def initworker(megabytes, tablebase):
+    worker['table'] = TranspositionTable(megabytes)
+    worker['tablebase'] = Tablebase(tablebase) if tablebase else None
+
+# Analyzes the given Position in a worker process and returns the result
+# described above.
+
+def analyzeposition(name, position, depth, movetime):
+    start = time.monotonic()
+    side = winner(position)
+    if side is not None:
+        score = winscore if side == position.side else -winscore
+        pv, nodes = [], 0
+    else:
+        score, pv = searchposition(position, depth, movetime, worker['table'],
+                                   tablebase = worker['tablebase'])
+        nodes = searchposition.nodes
+
+    pv = [command(move) for move in pv]
+    return {'id' : name, 'move' : pv[0] if pv else None, 'score' : score,
+            'pv' : pv, 'nodes' : nodes,
+            'time' : round(time.monotonic() - start, 3)}
+
+# Analyzes the positions of an iterable of pairs (id, Position), depth ply
+# deep or for movetime milliseconds (see searchposition in alphabeta.py), on
+# workers processes (by default, the number of CPU cores), and yields the
+# result of each position as soon as it is finished. At most inflight
+# positions (by default, twice the number of workers) are handed to the pool
+# at any time.
+
+def analyze(positions, depth = None, movetime = None, workers = None,
+            inflight = None, megabytes = 16, tablebase = None):
+    if workers is None : workers = multiprocessing.cpu_count()
+    if inflight is None : inflight = 2 * workers
+
+    with ProcessPoolExecutor(workers, initializer = initworker,
+                             initargs = (megabytes, tablebase)) as executor:
+        pending = set()
+
+        for name, position in positions:
+            if len(pending) >= inflight:
+                done, pending = wait(pending, return_when = FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(analyzeposition, name, position,
+                                        depth, movetime))
+
+        while pending:
+            done, pending = wait(pending, return_when = FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+# The number of positions evaluated at once with --static.
+chunk = 4096
+
+# Yields the static score described above of each position of an iterable of
+# pairs (id, Position), in the same order.
+
+def evaluatepositions(positions):
+    positions = iter(positions)
+    while True:
+        batch = list(itertools.islice(positions, chunk))
+        if not batch : return
+        scores = evaluatebatch([position for name, position in batch])
+        for (name, position), score in zip(batch, scores):
+            side = winner(position)
+            if side is not None:
+                score = winscore if side == position.side else -winscore
+            else:
+                score += skewscore(position)
+            yield {'id' : name, 'score' : score}
+
+# Yields the pairs (id, Position) described by the lines of JSON of the given
+# file. Blank lines are skipped.
+
+def readpositions(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip() : continue
+        record = json.loads(line)
+        if 'position' in record:
+            position = fromtext(record['position'])
+        else:
+            position = frompieces(record['pieces'], record.get('side', 'B'))
+        yield (record.get('id', number), position)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Analyze Dobutsu Shogi '
+                                     + 'positions given as lines of JSON.')
+    parser.add_argument('input', help = 'the file of positions (- for the '
+                        + 'standard input)')
+    parser.add_argument('--depth', type = int,
+                        help = 'the depth of the search in ply')
+    parser.add_argument('--movetime', type = int,
+                        help = 'the time of the search of each position in '
+                        + 'milliseconds')
+    parser.add_argument('--workers', type = int,
+                        help = 'the number of worker processes')
+    parser.add_argument('--inflight', type = int,
+                        help = 'the largest number of positions handed to '
+                        + 'the workers at any time')
+    parser.add_argument('--tablebase', help = 'a tablebase file (see '
+                        + 'tablebase.py)')
+    parser.add_argument('--static', action = 'store_true',
+                        help = 'give the static score of each position '
+                        + 'instead of searching it')
+    arguments = parser.parse_args()
+
+    if arguments.depth is None and arguments.movetime is None \
+       and not arguments.static:
+        parser.error('give --depth, --movetime or --static')
+
+    file = sys.stdin if arguments.input == '-' else open(arguments.input)
+    with file:
+        if arguments.static:
+            results = evaluatepositions(readpositions(file))
+        else:
+            results = analyze(readpositions(file), arguments.depth,
+                              arguments.movetime, arguments.workers,
+                              arguments.inflight,
+                              tablebase = arguments.tablebase)
+        for result in results:
+            print(json.dumps(result))
+            sys.stdout.flush()
+
+if __name__ == '__main__':
+    main()
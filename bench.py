@@ -0,0 +1,159 @@
+# The following program measures the speed of the search of alphabeta.py on
+# a fixed set of positions, so that changes to the search can be checked for
+# how they change its speed. Each position is searched once for each level of
+# difficulty of main.py, to the depth of that level, with a new
+# transposition table, and the program reports the number of nodes searched,
+# the number of nodes per second, the time taken to reach the depth and the
+# move chosen.
+
+# Usage: python bench.py --output baseline.json
+#        python bench.py --compare baseline.json
+
+# With --output, the results are also written to a file as a JSON object
+# {"results": [...], "total": {...}}, where each result is an object with the
+# keys name, level, depth, nodes, time, nps, move and score (see batch.py for
+# how moves are written), and total gives the nodes, time and nps of the
+# whole suite. With --compare, the results are compared with such a file, and
+# every position and level (and the whole suite) whose number of nodes per
+# second is more than threshold (10% by default) below that of the file is
+# reported as a regression, in which case the program exits with status 1.
+# A change in the number of nodes is also reported, but not as a regression:
+# the search is deterministic, so only a change to the search itself (which
+# may well be meant to search fewer nodes) can change it.
+
+# The times are the shortest of repeat runs (3 by default), which makes them
+# less sensitive to other programs running on the same machine.
+
+import argparse
+import json
+import sys
+import time
+
+from alphabeta import searchposition
+from board_input import command
+from notation import fromtext
+from transposition import TranspositionTable
+
+# The positions of the suite (see notation.py): the initial position with
+# either player to move, positions with many pieces in hand (where drops
+# multiply the moves), and ''try'' races where both lions have crossed the
+# middle of the board and race to the furthest rank.
+suite = (('opening-b', 'GLE/1C1/1c1/elg B -'),
+         ('opening-a', 'GLE/1C1/1c1/elg A -'),
+         ('drops-1', 'L1E/1C1/1e1/1l1 B Ggc'),
+         ('drops-2', '1L1/G1c/1Ce/1l1 A Eg'),
+         ('drops-3', '2E/3/l1L/e2 A GCCg'),
+         ('drops-4', '2E/1L1/3/e1l B GGCc'),
+         ('race-1', 'E2/g1L/l2/3 A GCCe'),
+         ('race-2', '3/E1L/l1G/3 B Cgec'),
+         ('race-3', '1E1/LGc/G1l/1e1 A c'))
+
+# The depth of each level of difficulty of main.py.
+depths = {level : level + 2 for level in range(1, 6)}
+
+# Searches every position of the suite at every level and returns the list
+# of results described above.
+
+def run(levels = (1, 2, 3, 4, 5), repeat = 1):
+    results = []
+    for name, text in suite:
+        position = fromtext(text)
+        for level in levels:
+            best = None
+            for n in range(repeat):
+                start = time.perf_counter()
+                score, pv = searchposition(position, depths[level],
+                                           table = TranspositionTable())
+                elapsed = time.perf_counter() - start
+                if best is None or elapsed < best : best = elapsed
+            nodes = searchposition.nodes
+            results.append({'name' : name, 'level' : level,
+                            'depth' : depths[level], 'nodes' : nodes,
+                            'time' : round(best, 6),
+                            'nps' : round(nodes / best) if best else 0,
+                            'move' : command(pv[0]), 'score' : score})
+    return results
+
+def total(results):
+    nodes = sum(result['nodes'] for result in results)
+    elapsed = sum(result['time'] for result in results)
+    return {'nodes' : nodes, 'time' : round(elapsed, 6),
+            'nps' : round(nodes / elapsed) if elapsed else 0}
+
+# Searches shorter than this many seconds are too short for their speed to
+# be compared on its own, and only count toward the total.
+mintime = 0.05
+
+# Returns two lists of messages: the regressions of results with respect to
+# the results of a baseline, and the changes in the number of nodes. The
+# total is compared over the positions and levels found in both.
+
+def compare(results, baseline, threshold = 0.1):
+    regressions, changes = [], []
+    saved = {(result['name'], result['level']) : result
+             for result in baseline['results']}
+    pairs = [(result['name'] + ' level ' + str(result['level']), result,
+              saved[(result['name'], result['level'])])
+             for result in results
+             if (result['name'], result['level']) in saved]
+    pairs.append(('total', total([new for label, new, old in pairs]),
+                  total([old for label, new, old in pairs])))
+
+    for label, new, old in pairs:
+        if new['nps'] < (1 - threshold) * old['nps'] \
+           and (label == 'total' or old['time'] >= mintime):
+            regressions.append(label + ': ' + str(new['nps'])
+                               + ' nodes/s, baseline ' + str(old['nps']))
+        if new['nodes'] != old['nodes']:
+            changes.append(label + ': ' + str(new['nodes'])
+                           + ' nodes, baseline ' + str(old['nodes']))
+    return (regressions, changes)
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Measure the speed of '
+                                     + 'the Dobutsu Shogi search.')
+    parser.add_argument('--levels', default = '12345',
+                        help = 'the levels to search, for instance 345')
+    parser.add_argument('--repeat', type = int, default = 3,
+                        help = 'the number of runs of each search (the '
+                        + 'shortest time is kept)')
+    parser.add_argument('--output', help = 'the file to write the results to')
+    parser.add_argument('--compare', help = 'a file of results to compare '
+                        + 'with')
+    parser.add_argument('--threshold', type = float, default = 0.1,
+                        help = 'the slowdown reported as a regression')
+    arguments = parser.parse_args()
+
+    levels = [int(level) for level in arguments.levels]
+    if any(level not in depths for level in levels):
+        parser.error('invalid levels ' + arguments.levels)
+
+    results = run(levels, arguments.repeat)
+    print('%-10s %5s %5s %9s %9s %9s  %s' % ('position', 'level', 'depth',
+                                            'nodes', 'time', 'nodes/s',
+                                            'move'))
+    for result in results:
+        print('%-10s %5d %5d %9d %9.3f %9d  %s' % (result['name'],
+              result['level'], result['depth'], result['nodes'],
+              result['time'], result['nps'], result['move']))
+    summary = total(results)
+    print('%-10s %5s %5s %9d %9.3f %9d' % ('total', '', '', summary['nodes'],
+                                           summary['time'], summary['nps']))
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            json.dump({'results' : results, 'total' : summary}, file,
+                      indent = 1)
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            regressions, changes = compare(results, json.load(file),
+                                           arguments.threshold)
+        for message in changes:
+            print('Changed: ' + message)
+        for message in regressions:
+            print('Regression: ' + message)
+        if regressions : sys.exit(1)
+
+if __name__ == '__main__':
+    main()
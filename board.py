@@ -1,7 +1,8 @@
 # Brian Chan
 # March 2021
 
-from board_hardware import perform
+from movegen import attacked
+from position import frompieces, square
 
 # This program gives a represention of the Dobutsu Shogi game board and its
 # pieces. In addition to this, this program has data structures and functions
@@ -231,7 +232,10 @@ def selection(side, pieces):
 # then this function gives the same return value as the capturewin function.
 # In these comments, the term ''furthest rank'' is a relative term. If Player A
 # has a piece on the furthest rank, that piece is on Rank 1, and if Player B
-# has a piece on the furthest rank, that piece is on Rank 4.
+# has a piece on the furthest rank, that piece is on Rank 4. Whether the lion
+# can be captured is answered by the attacked function in movegen.py, which
+# looks the square of the lion up in precomputed tables instead of trying
+# every move of the opponent.
 
 def capturewin(pieces):
 
@@ -254,23 +258,15 @@ def noncapturewin(pieces):
     # If Player A's lion has reached the furthest rank.
 
     if pieces['lion'][0][1][0] == 1:
-        selectedactions = selection(b, pieces)
-        for action in selectedactions:
-            state = perform(action, pieces)
-            if state is not None:
-                if capturewin(state) == b:
-                    return b
+        if attacked(frompieces(pieces), square(*pieces['lion'][0][1]), 1):
+            return b
         return a
 
     # If Player B's lion has reached the furthest rank.
 
     if pieces['lion'][1][1][0] == 4:
-        selectedactions = selection(a, pieces)
-        for action in selectedactions:
-            state = perform(action, pieces)
-            if state is not None:
-                if capturewin(state) == a:
-                    return a
+        if attacked(frompieces(pieces), square(*pieces['lion'][1][1]), 0):
+            return a
         return b
 
 
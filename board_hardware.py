@@ -1,7 +1,8 @@
 # Brian Chan
 # March 2021
 
-from copy import deepcopy
+from movegen import destinations, furthest, islegal
+from position import frompieces, topieces, square, kinds, sides, C
 
 # Constants indicating the players involved.
 a, b = 'A', 'B'
@@ -27,22 +28,24 @@ a, b = 'A', 'B'
 # representing the result of the requested action that was performed. Otherwise,
 # if the requested action is not a legal move, then the function returns None.
 
+# The action is translated into a move (see movegen.py) and performed with
+# the make function of the Position class in position.py, which is also used
+# by the search in alphabeta.py. The board that is returned is a new dictionary
+# built from the Position, so the dictionary passed in is never modified. The
+# square a piece moves to, and whether it is promoted there, are looked up in
+# the tables of movegen.py.
+
 def perform(action, pieces):
-    newpieces = deepcopy(pieces)
 
     # Determine the type of the piece being used.
-    if action[0][1] == 'L' : type = 'lion'
-    elif action[0][1] == 'G' : type = 'giraffe'
-    elif action[0][1] == 'E' : type = 'elephant'
-    elif action[0][1] == 'C' : type = 'chick'
-    elif action[0][1] == 'H' : type = 'hen'
+    kind = 'LGECH'.index(action[0][1])
 
     # Determine which piece (among the two pieces of the type selected) that
     # will be used.
     replica = int(action[0][2])
 
     # Keep track of the selected piece.
-    the_piece = newpieces[type][replica]
+    the_piece = pieces[kinds[kind]][replica]
     # Record whose side the piece belongs to.
     playing_side = the_piece[0]
     # Determine what kind of action is to be performed with the piece.
@@ -53,114 +56,38 @@ def perform(action, pieces):
 
     # If the piece does not represent a piece currently in play, then abort.
     if playing_side is None : return
+    side = sides.index(playing_side)
 
-    # Initialize variables i and j which represent the location on the board
-    # the selected piece will move towards if not in ``drop mode''.
-    if action_type in ('M', 'P'):
-        if the_piece[1] is None : return
+    # A drop is only possible for a piece in hand, onto a square of the board.
+    if action_type == 'D':
+        if the_piece[1] is not None : return
+        if si < 1 or si > 4 or sj < 1 or sj > 3 : return
+        move = (kind, None, square(si, sj))
 
-        i, j = the_piece[1]
-        i, j = i + si, j + sj
-
-        if i < 1 or i > 4 or j < 1 or j > 3:
-            return
-
-    # Ensure that a piece is promoted only if the chick has reached the
-    # furthest rank.
-    if action_type == 'P':
-        if playing_side == a and i > 1 : return
-        if playing_side == b and i < 4 : return
-
-    # Ensure that a move is made only if it is not a chick moving to the
-    # furthest rank (such an action has to be a promotion).
-    if action_type == 'M' and type == 'chick':
-        if playing_side == a and i == 1 : return
-        if playing_side == b and i == 4 : return
-
-    # Ensure that, if the chick or hen is used, that a legal move is being made
-    # on the board.
-    if action_type in ('M', 'P') and type == 'chick':
-        if playing_side == a and si == 1 : return
-        if playing_side == b and si == -1 : return
-
-    elif action_type in ('M', 'P') and type == 'hen':
-        if playing_side == a:
-            if (si,sj) == (1,-1) or (si,sj) == (1,1):
-                return
-        if playing_side == b:
-            if (si,sj) == (-1,-1) or (si,sj) == (-1,1):
-                return
-
-    # Perform a drop action.
-    if action_type == 'D' and the_piece[1] is None:
-        # Abort if there is another piece on the board that is in the way.
-        for kind in newpieces:
-            for piece in newpieces[kind]:
-                if piece[1] == (si,sj) : return
-
-        # Drop the piece.
-        the_piece[1] = (si,sj)
-
-    # Perform a move or promote action.
     elif action_type in ('M', 'P'):
-        # Determine the piece that is being captured, if any.
-        captured = None
-        captured_type = None
-
-        for kind in newpieces:
-            for piece in newpieces[kind]:
-                if piece[0] is not None and piece[1] == (i,j):
-                    captured = piece
-                    captured_type = kind
-
-        # If a piece is captured, do the following.
-        if captured is not None:
-            # Ensures that a player does not capture his/her piece by aborting
-            # if necessary.
-            if captured[0] == playing_side : return
-
-            # If a hen is captured, remove the hen from current play. Next,
-            # bring a chick that is not in play back into play, and keep it
-            # in the hand of the player who made the capture.
-            elif captured_type == 'hen':
-                captured[0] = None
-                removed = []
-
-                for piece in newpieces['chick']:
-                    if piece[0] is None:
-                        removed.append(piece)
-
-                captured_chick = removed[0]
-
-                captured_chick[0] = playing_side
-                captured_chick[1] = None
-
-
-            # If a non-hen piece is captured, then have the player collect
-            # the piece and place it into his/her hand.
-            else:
-                captured[0] = playing_side
-                captured[1] = None
-
-        # Move the selected piece the_piece on the board if the piece is not
-        # a chick being promoted.
-        if action_type == 'M' : the_piece[1] = (i,j)
-
-        # Remove the selected piece, the chick about to be promoted, from play.
-        # Next, take a hen not in play and put it into play be placing it on
-        # the board in the position (i,j).
-        elif action_type == 'P':
-            the_piece[0] = None
-            removed = []
-            for piece in newpieces['hen']:
-                if piece[0] is None:
-                    removed.append(piece)
-            promoted = removed[0]
-            promoted[0] = playing_side
-            promoted[1] = (i,j)
-
-    # Cannot drop a piece that is already on the board.
+        if the_piece[1] is None : return
+
+        # Ensure that the piece moves the way pieces of its type move for
+        # its side (chicks only move forward, hens don't move diagonally
+        # backward, etc.) and stays on the board.
+        origin = square(*the_piece[1])
+        target = destinations[side][kind][origin].get((si,sj))
+        if target is None : return
+
+        # Ensure that a piece is promoted if and only if it is a chick that
+        # has reached the furthest rank.
+        promoted = kind == C and bool(furthest[side] >> target & 1)
+        if (action_type == 'P') != promoted : return
+
+        move = (kind, origin, target)
+
     else : return
 
+    # Perform the move, unless a piece is in the way of a drop or a player
+    # would capture his/her own piece.
+    position = frompieces(pieces, playing_side)
+    if not islegal(position, move) : return
+    position.make(move)
+
     # Return the modified board.
-    return newpieces
+    return topieces(position)
@@ -3,6 +3,7 @@
 
 from board_hardware import perform
 from board_display import convert
+from position import coordinates, C
 
 # Constants indicating the players involved.
 a, b = 'A', 'B'
@@ -195,3 +196,17 @@ def enter(side, command, pieces):
         input()
         quit()
     return perform(action, pieces)
+
+# The following function gives the command (described above) that makes the
+# given move (see movegen.py), for instance 'mc3222'. A chick that moves to
+# the furthest rank of either side is always promoted ('p'), since a chick
+# only moves toward the furthest rank of its owner.
+
+def command(move):
+    kind, origin, target = move
+    letter = 'lgech'[kind]
+    destination = '%d%d' % coordinates(target)
+    if origin is None:
+        return 'd' + letter + destination
+    action = 'p' if kind == C and destination[0] in '14' else 'm'
+    return action + letter + '%d%d' % coordinates(origin) + destination
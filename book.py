@@ -0,0 +1,216 @@
+# The following program builds an opening book: a file that gives good moves
+# for Player B in the positions that can be reached in the first few moves of
+# a game, found by deep searches made once, offline, so that the program
+# plays these moves at once instead of searching them again in every game.
+# alphabeta.py looks the position up in the book (if one is given) before it
+# starts a search.
+
+# Usage: python book.py book.bin --plies 4 --depth 10
+
+# The book starts from the initial position (board.initialstate) with either
+# player to move. In a position where Player B is to move, every move is
+# searched depth ply deep, and the moves whose score is at most margin below
+# the best score are kept in the book, each with a weight: 1 for a move
+# margin below the best score, up to 1 + margin // skewunit for the best
+# moves (see alphabeta.py for the scores). The book then follows only these
+# moves for Player B, and every move for Player A (the user may play
+# anything), up to plies ply from the initial position.
+
+# A position and its mirror image have the same moves, mirrored, so the book
+# keeps a single entry for both (see canonical in notation.py).
+
+# The file starts with a header of 16 bytes (magic, the depth of the searches
+# as a 4-byte little-endian integer, and the number of entries as an 8-byte
+# little-endian integer), followed by one entry of 12 bytes per move kept in
+# the book: the position as the integer of canonical in notation.py (8
+# bytes), the move (of that position) as the integer of encodemove in
+# movegen.py (2 bytes) and its weight (2 bytes). The entries are sorted by
+# position, so that Book finds the entries of a position by binary search, in
+# O(log n) time, on the file opened with mmap.
+
+import argparse
+import mmap
+import random
+import struct
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from alphabeta import searchposition, skewscore, winscore, skewunit
+from board import initialstate
+from movegen import legalmoves, islegal, winner, encodemove, decodemove, \
+                    mirrormove
+from notation import canonical
+from position import frompieces, mirror, sides
+from transposition import TranspositionTable
+
+magic = b'DSB2'
+entry = struct.Struct('<QHH')
+
+# The transposition table of a worker process, kept from one position to the
+# next.
+worker = {}
+
+def initworker(megabytes):
+    worker['table'] = TranspositionTable(megabytes)
+
+# Returns the list of pairs (move, score) of the legal moves of the Position,
+# where score is the score of the move for the side to move after a search
+# depth ply deep (winscore or -winscore for a move that ends the game). The
+# score of the position after the move includes its score skew, as in
+# negamax, so the best score is the score of searchposition at the same
+# depth.
+
+def scoremoves(position, depth):
+    scored = []
+    for move in legalmoves(position):
+        undo = position.make(move)
+        win = winner(position)
+        if win is not None:
+            # The move ends the game: it wins, or it loses (a lion that moves
+            # to an attacked square of the furthest rank).
+            scored.append((move, winscore if win == 1 - position.side
+                                  else -winscore))
+        else:
+            score, pv = searchposition(position, depth - 1, None,
+                                       worker['table'])
+            scored.append((move, -(score + skewscore(position))))
+        position.unmake(undo)
+    return scored
+
+# Returns the list of pairs (move, weight) kept in the book from the list
+# given by scoremoves.
+
+def weighmoves(scored, margin):
+    best = max(score for move, score in scored)
+    return [(move, 1 + (margin - best + score) // skewunit)
+            for move, score in scored if score >= best - margin]
+
+# Builds the book described above and returns it as a dictionary from the
+# integers of canonical to the lists of pairs (move, weight). The positions
+# searched are the positions with these integers, so a position and its
+# mirror image are only searched once. The searches are made by workers
+# processes (by default, the number of CPU cores).
+
+def build(plies, depth, margin = 0, workers = None, report = None):
+    book = {}
+    frontier = {}
+    for side in sides:
+        position = frompieces(initialstate, side)
+        number, flipped = canonical(position)
+        frontier[number] = mirror(position) if flipped else position
+
+    with ProcessPoolExecutor(workers, initializer = initworker,
+                             initargs = (16,)) as executor:
+        for ply in range(plies):
+            keys = [key for key in frontier if frontier[key].side == 1]
+            positions = [frontier[key] for key in keys]
+            for key, scored in zip(keys, executor.map(scoremoves, positions,
+                                                      [depth] * len(keys))):
+                if scored : book[key] = weighmoves(scored, margin)
+
+            following = {}
+            for key, position in frontier.items():
+                if position.side == 1:
+                    moves = [move for move, weight in book.get(key, [])]
+                else:
+                    moves = legalmoves(position)
+                for move in moves:
+                    child = position.copy()
+                    child.make(move)
+                    if winner(child) is None:
+                        number, flipped = canonical(child)
+                        following[number] = mirror(child) if flipped \
+                                            else child
+            frontier = following
+
+            if report is not None : report(ply + 1, len(keys), len(book))
+
+    return book
+
+# Writes a book built by build to a file.
+
+def write(path, book, depth):
+    entries = sorted((key, encodemove(move), weight)
+                     for key in book for move, weight in book[key])
+    with open(path, 'wb') as file:
+        file.write(magic + struct.pack('<IQ', depth, len(entries)))
+        for key, move, weight in entries:
+            file.write(entry.pack(key, move, weight))
+
+# A book opened for probing. The file is memory-mapped read-only.
+
+class Book:
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        if self.data[:4] != magic:
+            raise ValueError(path + ' is not an opening book')
+        self.depth, self.size = struct.unpack_from('<IQ', self.data, 4)
+
+    # Returns the list of pairs (move, weight) of the book for the given
+    # Position, or an empty list if the Position is not in the book.
+    def probe(self, position):
+        key, flipped = canonical(position)
+        data = self.data
+
+        # Find the first entry whose position is not below key.
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from('<Q', data, 16 + 12 * middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        while low < self.size:
+            stored, move, weight = entry.unpack_from(data, 16 + 12 * low)
+            if stored != key : break
+            move = decodemove(move)
+            moves.append((mirrormove(move) if flipped else move, weight))
+            low += 1
+        return moves
+
+    # Returns a move of the book for the given Position, chosen at random
+    # with the weights of the book if randomize is True (otherwise, the move
+    # with the largest weight), or None if the Position is not in the book.
+    def choose(self, position, randomize = True):
+        moves = [(move, weight) for move, weight in self.probe(position)
+                 if islegal(position, move)]
+        if not moves : return
+        if not randomize : return max(moves, key = lambda pair : pair[1])[0]
+        return random.choices([move for move, weight in moves],
+                              [weight for move, weight in moves])[0]
+
+    def close(self):
+        self.data.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Build a Dobutsu Shogi '
+                                     + 'opening book.')
+    parser.add_argument('output', help = 'the file to write')
+    parser.add_argument('--plies', type = int, default = 4,
+                        help = 'the number of ply from the initial position '
+                        + 'covered by the book')
+    parser.add_argument('--depth', type = int, default = 10,
+                        help = 'the depth of the searches in ply')
+    parser.add_argument('--margin', type = int, default = 0,
+                        help = 'how far below the best score a move may be '
+                        + 'and still be kept')
+    parser.add_argument('--workers', type = int,
+                        help = 'the number of worker processes')
+    arguments = parser.parse_args()
+    if arguments.depth < 2 : parser.error('the depth must be at least 2')
+
+    def report(ply, searched, size):
+        print('Ply ' + str(ply) + ': ' + str(searched)
+              + ' positions searched, ' + str(size) + ' positions in the book')
+        sys.stdout.flush()
+
+    book = build(arguments.plies, arguments.depth, arguments.margin,
+                 arguments.workers, report)
+    write(arguments.output, book, arguments.depth)
+
+if __name__ == '__main__':
+    main()
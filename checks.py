@@ -0,0 +1,470 @@
+# The following program checks the fast code that the search of alphabeta.py
+# relies on against plain code that is written straight from the rules and
+# is too slow to be used in the search, on positions reached by random games
+# from the initial position. Each check gives the positions, moves or actions
+# on which the two disagree, so a change to position.py, movegen.py or
+# alphabeta.py can be checked before it is used.
+
+# Usage: python checks.py --positions 300 --seed 1
+
+# The program prints one line for each check and exits with status 1 if any
+# check fails. The checks are the following.
+
+# moves : legalmoves in movegen.py gives each move that the rules allow once,
+#         and no other move, and winner gives the player who has won by the
+#         rules.
+# islegal : islegal in movegen.py is True for the moves that legalmoves gives
+#           and False for every other move.
+# perform : every action of board.py on the board of a Position gives the
+#           same board with perform in board_hardware.py as with the rules
+#           applied to the pieces of the board, or None for both if the rules
+#           do not allow it (the pieces that are not in play never block a
+#           drop, whatever their locations say).
+# make : making every legal move of a Position and taking it back (see make
+#        and unmake in position.py) leaves the Position as it was, and the
+#        keys of the Position after the move are those computed from scratch
+#        from the tables of zobrist.py, and its totals of material and
+#        advancement those counted from its pieces.
+# search : the score of searchposition in alphabeta.py (without the
+#          quiescence search and the static evaluation) is the score of a
+#          plain minimax search, without pruning, transposition table or move
+#          ordering, to the depth that searchposition reached.
+# ponder : the result of pondering (see ponder.py) on the reply of the user
+#          is the score of searchposition in the position after the reply,
+#          with the history of the game that main.py gives the search then.
+# book : the moves that the opening book of book.py keeps never lose at once
+#        (such as a lion moving to an attacked square of the furthest rank),
+#        and the best score of the moves of the book is the score of
+#        searchposition at the same depth (unless it is a win or a loss,
+#        since searchposition stops deepening when it finds one).
+
+import argparse
+import math
+import random
+import sys
+
+import book
+from alphabeta import searchposition, playposition, skewscore, winscore, \
+                      skewunit, Statistics
+from board import initialstate, actions
+from board_hardware import perform
+from movegen import legalmoves, islegal, winner
+from notation import fromtext, totext, topacked
+from ponder import Ponderer
+from position import frompieces, topieces, mirrored, sides, kinds, \
+                     material, L, G, E, C, H
+from zobrist import boardkeys, handkeys, sidekey
+
+# Returns True if the player to move in the Position can end the game with a
+# win in one move.
+
+def winning(position):
+    for move in legalmoves(position):
+        undo = position.make(move)
+        win = winner(position)
+        position.unmake(undo)
+        if win == position.side : return True
+    return False
+
+# Returns a list of count distinct Positions reached by random games from the
+# initial position (with either player moving first), chosen with a random
+# number generator seeded with seed. The moves are chosen among the moves
+# after which the game goes on and the opponent cannot win in one move
+# (random moves would soon leave a lion to be captured, and most positions
+# would be decided at once), and a game starts again from the initial
+# position when there is no such move.
+
+def positions(count, seed):
+    generator = random.Random(seed)
+    found = {}
+    position = None
+    while len(found) < count:
+        if position is None:
+            position = frompieces(initialstate, generator.choice(sides))
+        moves = []
+        for move in legalmoves(position):
+            undo = position.make(move)
+            if winner(position) is None and not winning(position):
+                moves.append(move)
+            position.unmake(undo)
+        if not moves:
+            position = None
+            continue
+        position.make(generator.choice(moves))
+        found.setdefault(position.key, position.copy())
+    return list(found.values())
+
+# The changes in location (si,sj) each type of piece can make by the rules,
+# for a player whose forward direction is si == -1 (Player A). For Player B,
+# si changes sign. A hen moves like a lion except backwards diagonally.
+rules = {L: [(si, sj) for si in (-1, 0, 1) for sj in (-1, 0, 1)
+             if (si, sj) != (0, 0)],
+         G: [(-1, 0), (0, -1), (0, 1), (1, 0)],
+         E: [(-1, -1), (-1, 1), (1, -1), (1, 1)],
+         C: [(-1, 0)],
+         H: [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, 0)]}
+
+# Returns the list of the moves of the given side in the Position by the
+# rules: a piece moves to a square on the board that is not occupied by a
+# piece of the same side, and a giraffe, elephant or chick in hand is dropped
+# on an empty square (each type of piece once, however many are in hand).
+
+def rulemoves(position, side):
+    sign = 1 if side == 0 else -1
+    moves = []
+    for s in range(12):
+        cell = position.cells[s]
+        if cell == -1 or cell // 5 != side : continue
+        i, j = s // 3, s % 3
+        for si, sj in rules[cell % 5]:
+            ti, tj = i + sign * si, j + sj
+            if not (0 <= ti < 4 and 0 <= tj < 3) : continue
+            target = 3 * ti + tj
+            occupant = position.cells[target]
+            if occupant == -1 or occupant // 5 != side:
+                moves.append((cell % 5, s, target))
+    for kind in (G, E, C):
+        if position.hands[side][kind]:
+            for target in range(12):
+                if position.cells[target] == -1:
+                    moves.append((kind, None, target))
+    return moves
+
+# Returns the player who has won in the Position by the rules (None if
+# neither has): a player who has captured the lion wins, and a player whose
+# lion is on the furthest rank wins if no piece of the opponent can move to
+# its square, and loses otherwise.
+
+def rulewinner(position):
+    for side in (0, 1):
+        if position.hands[side][L] : return side
+    for side, rank in ((0, 0), (1, 3)):
+        for s in range(3 * rank, 3 * rank + 3):
+            if position.cells[s] == 5 * side + L:
+                if any(move[2] == s for move in rulemoves(position, 1 - side)):
+                    return 1 - side
+                return side
+    return None
+
+def checkmoves(positions):
+    failures = []
+    for position in positions:
+        moves = legalmoves(position)
+        expected = rulemoves(position, position.side)
+        if len(moves) != len(set(moves)) or sorted(moves, key = str) \
+           != sorted(expected, key = str):
+            differences = sorted(set(moves) ^ set(expected), key = str)
+            failures.append(totext(position) + ': legalmoves gives '
+                            + str(differences) + ' differently')
+        for move in moves:
+            undo = position.make(move)
+            if winner(position) != rulewinner(position):
+                failures.append(totext(position) + ': winner gives '
+                                + str(winner(position)) + ', the rules give '
+                                + str(rulewinner(position)))
+            position.unmake(undo)
+    return failures
+
+def checkislegal(positions):
+    failures = []
+    for position in positions:
+        moves = set(legalmoves(position))
+        for kind in range(5):
+            for origin in [None] + list(range(12)):
+                for target in range(12):
+                    move = (kind, origin, target)
+                    if islegal(position, move) != (move in moves):
+                        failures.append(totext(position) + ': islegal gives '
+                                        + str(move not in moves) + ' for '
+                                        + str(move))
+    return failures
+
+# Returns the board (the dictionary described in board.py) after the action
+# by the rules, or None if the rules do not allow it. Only the pieces in play
+# count: the entries [None, ...] are not on the board, whatever their
+# locations say.
+
+def ruleperform(action, pieces):
+    kind = 'LGECH'.index(action[0][1])
+    type = kinds[kind]
+    replica = int(action[0][2])
+    piece = pieces[type][replica]
+    owner = piece[0]
+    if owner is None : return None
+    side = sides.index(owner)
+    board = {type: [list(entry) for entry in pieces[type]] for type in pieces}
+    occupants = {tuple(entry[1]): (other, entry) for other in board
+                 for entry in board[other]
+                 if entry[0] is not None and entry[1] is not None}
+
+    # A piece in hand is dropped onto an empty square of the board.
+    if action[0][0] == 'D':
+        target = action[1]
+        if piece[1] is not None or target in occupants : return None
+        if not (1 <= target[0] <= 4 and 1 <= target[1] <= 3) : return None
+        board[type][replica][1] = target
+        return board
+
+    # A piece on the board moves the way its type moves, to a square of the
+    # board that is not occupied by a piece of the same side, and a chick is
+    # promoted when (and only when) it reaches the furthest rank.
+    if piece[1] is None : return None
+    si, sj = action[1]
+    if (si if side == 0 else -si, sj) not in rules[kind] : return None
+    target = (piece[1][0] + si, piece[1][1] + sj)
+    if not (1 <= target[0] <= 4 and 1 <= target[1] <= 3) : return None
+    promoted = type == 'chick' and target[0] == (1 if side == 0 else 4)
+    if (action[0][0] == 'P') != promoted : return None
+
+    # A captured piece goes to the hand of the player who captured it, and a
+    # captured hen goes there as a chick.
+    if target in occupants:
+        other, entry = occupants[target]
+        if entry[0] == owner : return None
+        if other == 'hen':
+            entry[0] = None
+            free = [chick for chick in board['chick'] if chick[0] is None]
+            free[0][:] = [owner, None]
+        else:
+            entry[:] = [owner, None]
+
+    if promoted:
+        board[type][replica][0] = None
+        free = [hen for hen in board['hen'] if hen[0] is None]
+        free[0][:] = [owner, target]
+    else:
+        board[type][replica][1] = target
+    return board
+
+# Returns a copy of a board (the dictionary described in board.py) in which
+# the entries that are not in play are given the location of an empty square
+# (their locations do not matter, so a drop there is still allowed).
+
+def stale(pieces):
+    occupied = [entry[1] for type in pieces for entry in pieces[type]
+                if entry[0] is not None]
+    empty = [(i, j) for i in range(1, 5) for j in range(1, 4)
+             if (i, j) not in occupied]
+    return {type: tuple([None, empty[0]] if entry[0] is None else entry
+                        for entry in pieces[type]) for type in pieces}
+
+# Returns the pieces in play on a board (the dictionary described in
+# board.py), in an order that does not depend on the entries they are in.
+
+def inplay(pieces):
+    if pieces is None : return None
+    return sorted((type, entry[0], str(entry[1])) for type in pieces
+                  for entry in pieces[type] if entry[0] is not None)
+
+def checkperform(positions):
+    failures = []
+    for position in positions:
+        for pieces in (topieces(position), stale(topieces(position))):
+            for key in actions:
+                for action in actions[key]:
+                    found = inplay(perform(action, pieces))
+                    expected = inplay(ruleperform(action, pieces))
+                    if found != expected:
+                        failures.append(totext(position) + ': perform gives '
+                                        + str(found) + ' for ' + str(action)
+                                        + ', the rules give ' + str(expected))
+    return failures
+
+# Returns the keys (key, mirrorkey) of a Position computed from its pieces.
+
+def keys(position):
+    key = mirrorkey = sidekey if position.side == 1 else 0
+    for s in range(12):
+        cell = position.cells[s]
+        if cell != -1:
+            key ^= boardkeys[cell // 5][cell % 5][s]
+            mirrorkey ^= boardkeys[cell // 5][cell % 5][mirrored[s]]
+    for side in (0, 1):
+        for kind in range(5):
+            for n in range(1, position.hands[side][kind] + 1):
+                key ^= handkeys[side][kind][n]
+                mirrorkey ^= handkeys[side][kind][n]
+    return (key, mirrorkey)
+
+# Returns the totals (boardvalues, handvalues, advancement) of a Position
+# counted from its pieces: the values of the pieces (see material in
+# position.py) and the ranks each chick has advanced from the back rank of
+# its side.
+
+def totals(position):
+    boardvalues, handvalues, advancement = [0, 0], [0, 0], [0, 0]
+    for s in range(12):
+        cell = position.cells[s]
+        if cell != -1:
+            side, kind = cell // 5, cell % 5
+            boardvalues[side] += material[kind]
+            if kind == C : advancement[side] += s // 3 if side else 3 - s // 3
+    for side in (0, 1):
+        for kind in range(5):
+            handvalues[side] += material[kind] * position.hands[side][kind]
+    return (boardvalues, handvalues, advancement)
+
+# The state of a Position that make and unmake change.
+
+def state(position):
+    return (position.side, position.key, position.mirrorkey,
+            [masks[:] for masks in position.masks],
+            [hand[:] for hand in position.hands], position.occupied[:],
+            position.cells[:], position.boardvalues[:],
+            position.handvalues[:], position.advancement[:])
+
+def checkmake(positions):
+    failures = []
+    for position in positions:
+        before = state(position)
+        for move in legalmoves(position):
+            undo = position.make(move)
+            if (position.key, position.mirrorkey) != keys(position):
+                failures.append(totext(position) + ': wrong keys after '
+                                + str(move))
+            if (position.boardvalues, position.handvalues,
+                position.advancement) != totals(position):
+                failures.append(totext(position) + ': wrong totals after '
+                                + str(move))
+            position.unmake(undo)
+            if state(position) != before:
+                failures.append(totext(position) + ': not restored after '
+                                + str(move))
+    return failures
+
+# The score of the Position for the player to move by minimax, scored as in
+# alphabeta.py: the score skew is added at every node but the root.
+
+def minimax(position, depth, root = True):
+    win = winner(position)
+    if win is not None:
+        return winscore if win == position.side else -winscore
+    skew = 0 if root else skewscore(position)
+    if depth == 0 : return skew
+    moves = legalmoves(position)
+    if not moves : return -winscore
+    best = -math.inf
+    for move in moves:
+        undo = position.make(move)
+        best = max(best, -minimax(position, depth - 1, False))
+        position.unmake(undo)
+    return best + skew
+
+# The depth of the search. Repetitions (see alphabeta.py) cannot happen
+# within three ply, so they do not make the scores differ.
+searchdepth = 3
+
+def checksearch(positions):
+    failures = []
+    for position in positions[:len(positions) // 10 + 1]:
+        if winner(position) is not None : continue
+        stats = Statistics()
+        score, pv = searchposition(position, searchdepth, stats = stats,
+                                   quiescence = False, evaluation = False)
+        depth = stats.iterations[-1][0]
+        expected = minimax(position, depth)
+        if score != expected:
+            failures.append(totext(position) + ': searchposition gives '
+                            + str(score) + ', minimax gives ' + str(expected))
+    return failures
+
+# The depth of the searches of the ponder check.
+ponderdepth = 3
+
+# The program plays a move in the Position with a Ponderer, as main.py does
+# (with the key of the Position in the history), and pondering is left to
+# finish. The result for each reply is compared with a search after the
+# reply with the history of the game at that time: the Position, the
+# position after the move and the position after the reply.
+
+def checkponder(positions):
+    failures = []
+    for position in positions[:len(positions) // 10 + 1]:
+        if winner(position) is not None : continue
+        ponder = Ponderer(1)
+        history = [position.key]
+        score, pv = playposition(position, ponderdepth, ponder = ponder,
+                                 history = history)
+        if ponder.thread is not None : ponder.thread.join()
+        following = position.copy()
+        following.make(pv[0])
+        key = following.key
+        for move in legalmoves(following):
+            undo = following.make(move)
+            if winner(following) is None:
+                found = ponder.results[topacked(following)][1]
+                game = history + [key, following.key]
+                expected, line = searchposition(following, ponderdepth,
+                                                history = game)
+                if found != expected:
+                    failures.append(totext(following) + ': pondering gives '
+                                    + str(found) + ', searchposition gives '
+                                    + str(expected))
+            following.unmake(undo)
+    return failures
+
+# A position in which two moves of the lion of Player B to the furthest rank
+# lose, and the third wins.
+losingtries = fromtext('1G1/E2/1L1/el1 B -')
+
+# The depth and margin of the searches of the book check.
+bookdepth = 2
+bookmargin = 2 * skewunit
+
+def checkbook(positions):
+    failures = []
+    book.initworker(1)
+    for position in [losingtries] + positions:
+        losing = []
+        for move in legalmoves(position):
+            undo = position.make(move)
+            if winner(position) == position.side : losing.append(move)
+            position.unmake(undo)
+        if not losing : continue
+        kept = book.weighmoves(book.scoremoves(position, bookdepth),
+                               bookmargin)
+        for move, weight in kept:
+            if move in losing:
+                failures.append(totext(position) + ': the book keeps '
+                                + str(move) + ', which loses')
+
+    for position in positions[:len(positions) // 10 + 1]:
+        if winner(position) is not None : continue
+        book.initworker(1)
+        best = max(score for move, score
+                   in book.scoremoves(position, bookdepth))
+        score, pv = searchposition(position, bookdepth)
+        if abs(score) < winscore // 2 and best != score:
+            failures.append(totext(position) + ': the best score of the book '
+                            + 'is ' + str(best) + ', searchposition gives '
+                            + str(score))
+    return failures
+
+checks = (('moves', checkmoves), ('islegal', checkislegal),
+          ('perform', checkperform), ('make', checkmake),
+          ('search', checksearch), ('ponder', checkponder),
+          ('book', checkbook))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Check the Dobutsu Shogi '
+                                     + 'move generator and search against '
+                                     + 'plain code.')
+    parser.add_argument('--positions', type = int, default = 300,
+                        help = 'the number of random positions')
+    parser.add_argument('--seed', type = int, default = 1,
+                        help = 'the seed of the random games')
+    arguments = parser.parse_args()
+
+    sample = positions(arguments.positions, arguments.seed)
+    failed = False
+    for name, check in checks:
+        failures = check(sample)
+        print(name + ': ' + ('ok' if not failures
+                             else str(len(failures)) + ' failures'))
+        for failure in failures[:10]:
+            print('  ' + failure)
+        failed = failed or bool(failures)
+    if failed : sys.exit(1)
+
+if __name__ == '__main__':
+    main()
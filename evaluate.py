@@ -0,0 +1,80 @@
+# The following program gives the static evaluation of a Position (see
+# position.py) that the search of alphabeta.py adds to the score skew where
+# the search stops. The evaluation is a weighted sum of the following
+# features, each of them counted for the player to move minus the same count
+# for the other player.
+
+# board : the values (see material in position.py) of the pieces on the board
+# hand : the values of the pieces in hand
+# mobility : the number of squares the lion can move to (squares that are not
+#            occupied by pieces of the same side, whether they are attacked or
+#            not)
+# advancement : the number of ranks each chick has advanced from the back
+#               rank of its side, where its lion starts (a chick starts one
+#               rank ahead)
+
+# The evaluation is a number of score units (see alphabeta.py) and stays far
+# below skewunit for most positions, so it only chooses between moves that
+# the score skew and the search cannot tell apart.
+
+# The Position keeps the totals of material and advancement of each side up
+# to date as moves are made and taken back (see position.py), so evaluate
+# reads them instead of looking at every square, and only the mobility of
+# the lions is found here, from the tables of movegen.py.
+
+# evaluate gives the evaluation of a single Position. evaluatebatch gives the
+# evaluations of a list of Positions at once: with NumPy, the features of
+# all of the Positions are gathered in an array (one row for each Position)
+# and multiplied by the weights in one product, which costs less for each
+# Position than evaluate when the list is long. Without NumPy, evaluatebatch
+# calls evaluate for each Position, with the same results.
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from movegen import attacks, squares
+from position import L
+
+# The weight of each feature, in the order board, hand, mobility and
+# advancement. A piece in hand can be dropped on any empty square, so it is
+# worth a little more than the same piece on the board.
+weights = (8, 10, 3, 2)
+
+# Returns the number of squares the lion of the given side can move to in
+# the Position (0 if the lion has been captured).
+
+def mobility(position, side):
+    lion = position.masks[side][L]
+    if not lion : return 0
+    return len(squares[attacks[side][L][lion.bit_length() - 1]
+                       & ~position.occupied[side]])
+
+# Returns the evaluation of the Position for the player to move.
+
+def evaluate(position):
+    own, other = position.side, 1 - position.side
+    boardvalues, handvalues = position.boardvalues, position.handvalues
+    advancement = position.advancement
+    lions = mobility(position, own) - mobility(position, other)
+    return weights[0] * (boardvalues[own] - boardvalues[other]) \
+           + weights[1] * (handvalues[own] - handvalues[other]) \
+           + weights[2] * lions + weights[3] * (advancement[own]
+                                                - advancement[other])
+
+# Returns the list of the evaluations of the Positions for their players to
+# move.
+
+def evaluatebatch(positions):
+    if numpy is None or not positions:
+        return [evaluate(position) for position in positions]
+
+    # The features of each Position for each side, then for Player A minus
+    # Player B.
+    totals = numpy.array([(position.boardvalues, position.handvalues,
+                           (mobility(position, 0), mobility(position, 1)),
+                           position.advancement) for position in positions])
+    scores = (totals[:, :, 0] - totals[:, :, 1]) @ numpy.array(weights)
+    turns = numpy.array([position.side for position in positions])
+    return numpy.where(turns == 0, scores, -scores).tolist()
@@ -3,10 +3,17 @@
 
 # This program, main.py, is the main user interface.
 
+import argparse
+
 from board import initialstate, capturewin, noncapturewin
 from board_display import display
 from board_input import enter, commandinstructions
-from alphabeta import alphabeta
+from alphabeta import alphabeta, Statistics
+from book import Book
+from movegen import repetitions
+from parallel import LazyPool, RootPool
+from ponder import Ponderer
+from position import frompieces
 
 # Constants indicating the players involved.
 a, b = 'A', 'B'
@@ -26,16 +33,45 @@ a, b = 'A', 'B'
 # ---------------
 # ---------------
 
+# The time budget, in milliseconds, for each level of difficulty. At each
+# level the program searches as many ply as the level allows, but if the
+# position is complicated enough for the time budget to run out first, the
+# program plays the best move it has found so far.
+
+movetimes = {1 : 2000, 2 : 4000, 3 : 8000, 4 : 15000, 5 : 30000}
+
+# Raised by the functions below when the game ends, so that main can close
+# the pool of processes (and the shared memory of its transposition table)
+# before the program exits.
+
+class GameOver(Exception):
+    pass
+
+# Records the position in which the given player is to move in the history
+# of the game (the list of the keys of its positions, see position.py), and
+# ends the game in a draw if the same position has occurred three times (see
+# repetitions in movegen.py).
+
+def record(board, side, history):
+    key = frompieces(board, side).key
+    history.append(key)
+    if history.count(key) >= repetitions:
+        print("The same position has occurred three times. The game is a " +
+        "draw. Enter to exit.")
+        input()
+        raise GameOver
+
 # This function runs during Player A's turn.
 
-def playerA(board1):
+def playerA(board1, history = None):
+    if history is not None : record(board1, a, history)
     command = input("Your turn: ")
     board2 = enter(a, command, board1)
 
     if board2 is None:
         print("Press enter to exit the game.")
         input()
-        quit()
+        raise GameOver
     else:
         display(board2)
 
@@ -45,28 +81,36 @@ def playerA(board1):
     if lioncapture2 == a:
         print("Player A has won the game. Enter to exit.")
         input()
-        quit()
+        raise GameOver
 
     if lioncross2 == a:
         print("Player A has won the game. Enter to exit.")
         input()
-        quit()
+        raise GameOver
 
     elif lioncross2 == b:
         print("Player B has won the game. Enter to exit.")
         input()
-        quit()
+        raise GameOver
 
     return board2
 
 # This function runs during Player B's turn.
 
-def playerB(board2, ply):
+def playerB(board2, ply, movetime, pool = None, book = None, stats = False,
+            ponder = None, history = None):
+    if history is not None : record(board2, b, history)
     print('Thinking ...')
 
-    board1 = alphabeta(board2, ply)
+    statistics = Statistics() if stats else None
+    board1 = alphabeta(board2, ply, movetime = movetime, pool = pool,
+                       book = book, stats = statistics, ponder = ponder,
+                       history = history)
 
     display(board1)
+    if statistics is not None and statistics.iterations:
+        for line in statistics.report():
+            print(line)
 
     lioncapture1 = capturewin(board1)
     lioncross1 = noncapturewin(board1)
@@ -74,17 +118,17 @@ def playerB(board2, ply):
     if lioncapture1 == b:
         print("Player B has won the game. Enter to exit.")
         input()
-        quit()
+        raise GameOver
 
     if lioncross1 == b:
         print("Player B has won the game. Enter to exit.")
         input()
-        quit()
+        raise GameOver
 
     elif lioncross1 == a:
         print("Player A has won the game. Enter to exit.")
         input()
-        quit()
+        raise GameOver
 
     return board1
 
@@ -130,11 +174,11 @@ def levelquery():
     while True:
         print()
         print("SET LEVEL OF DIFFICULTY (Level 1 is easiest, Level 5 is hardest.)")
-        print("Level 1 (3 ply)")
-        print("Level 2 (4 ply)")
-        print("Level 3 (5 ply)")
-        print("Level 4 (6 ply)")
-        print("Level 5 (7 ply)")
+        print("Level 1 (3 ply, at most 2 seconds)")
+        print("Level 2 (4 ply, at most 4 seconds)")
+        print("Level 3 (5 ply, at most 8 seconds)")
+        print("Level 4 (6 ply, at most 15 seconds)")
+        print("Level 5 (7 ply, at most 30 seconds)")
         level = input("Enter 1 for Level 1, 2 for Level 2, ..., and 5 for" +\
         " Level 5: ")
         try:
@@ -145,11 +189,39 @@ def levelquery():
         if 1 <= level <= 5:
             break
 
-    return level + 2
+    return level
 
-# Runs the user interface.
+# Runs the user interface. The program can be run with the option
+# --workers n to search with n processes (see parallel.py), and with the
+# option --lazy to have them share a transposition table (Lazy SMP) instead
+# of sharing the moves of the root. The option --book file makes the program
+# play the moves of an opening book (see book.py) when it can, and the option
+# --stats prints the statistics of each search (see alphabeta.py). The option
+# --ponder makes the program think while the user is deciding on a move (see
+# ponder.py), when it searches with a single process.
 
 def main():
+    parser = argparse.ArgumentParser(description = 'Play Dobutsu Shogi.')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'the number of processes searching in parallel')
+    parser.add_argument('--lazy', action = 'store_true',
+                        help = 'share a transposition table between the '
+                        + 'processes (Lazy SMP)')
+    parser.add_argument('--book', help = 'an opening book file (see book.py)')
+    parser.add_argument('--stats', action = 'store_true',
+                        help = 'print the statistics of each search')
+    parser.add_argument('--ponder', action = 'store_true',
+                        help = 'think while the user is deciding on a move')
+    arguments = parser.parse_args()
+
+    book = Book(arguments.book) if arguments.book else None
+    ponder = Ponderer() if arguments.ponder else None
+
+    # The pool of processes is created once for the whole game.
+    pool = None
+    if arguments.workers > 1:
+        pool = (LazyPool if arguments.lazy else RootPool)(arguments.workers)
+
     print()
     print("** DOBUTSU SHOGI PLAYER **")
     print("Brian Chan - 2021")
@@ -161,19 +233,32 @@ def main():
 
     commandsquery()
     first = orderquery()
-    ply = levelquery()
+    level = levelquery()
+    ply, movetime = level + 2, movetimes[level]
 
     board = initialstate
     display(board)
-    if first == 0:
-        while True:
-            brd = playerA(board)
-            board = playerB(brd, ply)
-
-    if first == 1:
-        while True:
-            brd = playerB(board, ply)
-            board = playerA(brd)
+    history = []
+
+    # The pool is closed however the game ends, so that its processes are
+    # shut down and the shared memory of LazyPool is removed before the
+    # program exits.
+    try:
+        if first == 0:
+            while True:
+                brd = playerA(board, history)
+                board = playerB(brd, ply, movetime, pool, book,
+                                arguments.stats, ponder, history)
+
+        if first == 1:
+            while True:
+                brd = playerB(board, ply, movetime, pool, book,
+                              arguments.stats, ponder, history)
+                board = playerA(brd, history)
+    except GameOver:
+        pass
+    finally:
+        if pool is not None : pool.close()
 
 if __name__ == '__main__':
     main()
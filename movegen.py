@@ -0,0 +1,249 @@
+# The following program gives the moves that can be made in a Position (see
+# position.py) and determines when a side has won. It plays the role that the
+# selection, capturewin and noncapturewin functions of board.py play for the
+# dictionary described in board.py.
+
+# Player B
+#    1  2  3
+# 1  G  L  E
+# 2  *  C  *
+# 3  *  c  *
+# 4  e  l  g
+# Player A
+
+# A move is a tuple
+
+# (kind, origin, target)
+
+# where kind is the type of the piece (L, G, E, C or H from position.py),
+# origin is the square the piece moves from (None if the piece is dropped from
+# the hand) and target is the square the piece moves or is dropped to. Squares
+# are numbered as in position.py. A chick that moves to the furthest rank is
+# always promoted, so promotions are not written separately.
+
+from position import L, G, E, C, H, coordinates, mirrored, full
+
+# Moves can also be written as integers of 11 bits (for instance, to store
+# them in a file or in shared memory): kind * 256 + origin * 16 + target,
+# where origin is 15 for a drop. The integer 2047 stands for no move (None).
+
+nomove = 2047
+
+def encodemove(move):
+    if move is None : return nomove
+    kind, origin, target = move
+    return kind * 256 + (15 if origin is None else origin) * 16 + target
+
+def decodemove(number):
+    if number == nomove : return
+    origin = number >> 4 & 15
+    return (number >> 8, None if origin == 15 else origin, number & 15)
+
+# Returns the move that plays in the mirror image of a Position (see mirror
+# in position.py) the role that the given move plays in the Position.
+
+def mirrormove(move):
+    if move is None : return
+    kind, origin, target = move
+    return (kind, None if origin is None else mirrored[origin],
+            mirrored[target])
+
+# steps[side][kind] lists the changes in location (si,sj) a piece of the
+# given side and type can make, in the same form as the actions dictionary in
+# board.py. Player A moves towards Rank 1 and Player B moves towards Rank 4.
+
+steps = [[], []]
+
+steps[0] = [[(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)],
+            [(-1,0), (0,-1), (0,1), (1,0)],
+            [(-1,-1), (-1,1), (1,-1), (1,1)],
+            [(-1,0)],
+            [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,0)]]
+
+steps[1] = [[(-si,sj) for si,sj in steps[0][kind]] for kind in range(5)]
+
+# The board has only twelve squares, so everything the move generator needs
+# to know about where a piece can go is computed once, when this program is
+# imported, and looked up afterwards instead of being worked out from the
+# changes in location above on every call.
+
+# destinations[side][kind][s] maps each change in location (si,sj) that a
+# piece of the given side and type on square s can make without leaving the
+# board to the square it moves to.
+
+def destinationmap(side, kind, s):
+    i, j = coordinates(s)
+    return {(si,sj) : s + 3 * si + sj for si, sj in steps[side][kind]
+            if 1 <= i + si <= 4 and 1 <= j + sj <= 3}
+
+destinations = [[[destinationmap(side, kind, s) for s in range(12)]
+                 for kind in range(5)] for side in range(2)]
+
+# attacks[side][kind][s] is the set of squares (see position.py) that a piece
+# of the given side and type on square s attacks, that is, the squares it
+# could move to if they were empty. attackers[side][kind][s] is the set of
+# squares from which a piece of the given side and type attacks square s.
+
+attacks = [[[sum(1 << t for t in destinations[side][kind][s].values())
+             for s in range(12)] for kind in range(5)] for side in range(2)]
+
+attackers = [[[sum(1 << t for t in range(12) if attacks[side][kind][t] >> s & 1)
+               for s in range(12)] for kind in range(5)] for side in range(2)]
+
+# squares[mask] is the tuple of the squares of the set of squares mask, in
+# increasing order, so that the squares of a set are listed without testing
+# its bits one at a time. furthest[side] is the furthest rank of the side
+# (where its chicks are promoted and where its lion wins).
+
+squares = tuple(tuple(s for s in range(12) if mask >> s & 1)
+                for mask in range(full + 1))
+
+furthest = (0b111, 0b111 << 9)
+
+# Returns a list of the legal moves of the given side (0 for Player A and 1
+# for Player B; by default, the side to move in the Position). Unlike the
+# selection function in board.py, every move in the list is legal: pieces
+# only move to squares on the board that are not occupied by pieces of the
+# same side, and pieces in hand are only dropped onto empty squares. When a
+# side has two pieces of the same type in hand, dropping either of them gives
+# the same position, so each type of piece in hand is dropped only once on
+# each empty square.
+
+def legalmoves(position, side = None):
+    if side is None : side = position.side
+    moves = []
+    own = position.occupied[side]
+    masks = position.masks[side]
+    table = attacks[side]
+
+    for kind in range(5):
+        reach = table[kind]
+        for origin in squares[masks[kind]]:
+            for target in squares[reach[origin] & ~own]:
+                moves.append((kind, origin, target))
+
+    empty = squares[full & ~(own | position.occupied[1 - side])]
+    hand = position.hands[side]
+    for kind in (G, E, C):
+        if hand[kind]:
+            for target in empty:
+                moves.append((kind, None, target))
+
+    return moves
+
+# Returns True if the move is one of the moves that legalmoves gives for the
+# side to move in the Position, without listing them.
+
+def islegal(position, move):
+    kind, origin, target = move
+    side = position.side
+    if origin is None:
+        return kind in (G, E, C) and position.hands[side][kind] > 0 \
+               and position.cells[target] == -1
+    return bool(position.masks[side][kind] >> origin & 1
+                and attacks[side][kind][origin] >> target & 1
+                and not position.occupied[side] >> target & 1)
+
+# Returns True if square s is attacked by a piece of the given side, that is,
+# if a piece of the given side on the square could be captured by that side.
+
+def attacked(position, s, side):
+    masks = position.masks[side]
+    table = attackers[side]
+    return bool(masks[L] & table[L][s] or masks[G] & table[G][s]
+                or masks[E] & table[E][s] or masks[C] & table[C][s]
+                or masks[H] & table[H][s])
+
+# Returns the mask of the squares of the furthest rank to which the lion of
+# the given side can move without being captured (a try that wins the game):
+# squares next to the lion that are not occupied by pieces of the same side
+# and that the opponent does not attack. The pieces do not slide, so moving
+# the lion or capturing a piece there does not change which squares are
+# attacked.
+
+def safetries(position, side):
+    lion = position.masks[side][L]
+    if not lion : return 0
+    mask = 0
+    reach = attacks[side][L][lion.bit_length() - 1]
+    for target in squares[reach & furthest[side] & ~position.occupied[side]]:
+        if not attacked(position, target, 1 - side) : mask |= 1 << target
+    return mask
+
+# Returns the moves of the side to move in the Position that the quiescence
+# search of alphabeta.py looks at: the captures, the moves of the lion to the
+# furthest rank (a try), and every move of the lion if escape is True (when
+# the lion is attacked, and moving it is the only way to save it besides
+# capturing the attacker). Drops are never among these moves, and neither
+# are moves of the lion that do not capture to a square attacked by the
+# opponent (the opponent would capture the lion).
+
+# If threat is not 0, then it is the mask given by safetries for the
+# opponent, and the moves that stop these tries are added: the moves and
+# drops that do not capture after which the piece moved or dropped attacks
+# every square of threat (only that piece attacks new squares, so no other
+# move can make the tries unsafe). A chick that reaches the furthest rank
+# attacks like a hen.
+
+def tacticalmoves(position, escape = False, threat = 0):
+    side = position.side
+    moves = []
+    cells = position.cells
+    rank = furthest[side]
+    own = position.occupied[side]
+
+    for kind in range(5):
+        reach = attacks[side][kind]
+        for origin in squares[position.masks[side][kind]]:
+            for target in squares[reach[origin] & ~own]:
+                if cells[target] != -1:
+                    moves.append((kind, origin, target))
+                elif kind == L and (escape or rank >> target & 1) \
+                     and not attacked(position, target, 1 - side):
+                    moves.append((kind, origin, target))
+                elif threat:
+                    promoted = kind == C and rank >> target & 1
+                    cover = attacks[side][H if promoted else kind][target]
+                    if cover & threat == threat and (kind != L or not
+                            attacked(position, target, 1 - side)):
+                        moves.append((kind, origin, target))
+
+    if threat:
+        empty = squares[full & ~(own | position.occupied[1 - side])]
+        hand = position.hands[side]
+        for kind in (G, E, C):
+            if hand[kind]:
+                for target in empty:
+                    if attacks[side][kind][target] & threat == threat:
+                        moves.append((kind, None, target))
+
+    return moves
+
+# Returns the side (0 or 1) that has won in the given Position, or None if
+# neither side has won. This is the combination of the capturewin and
+# noncapturewin functions in board.py: a side wins if it has captured the
+# opponent's lion, or if its lion has reached the furthest rank and cannot
+# be captured by the opponent (the square of the lion is not attacked by
+# the opponent).
+
+def winner(position):
+
+    # If a lion has been captured.
+    if position.hands[0][L] : return 0
+    if position.hands[1][L] : return 1
+
+    # If Player A's lion has reached the furthest rank.
+    lion = position.masks[0][L]
+    if lion & furthest[0]:
+        return 1 if attacked(position, lion.bit_length() - 1, 1) else 0
+
+    # If Player B's lion has reached the furthest rank.
+    lion = position.masks[1][L]
+    if lion & furthest[1]:
+        return 0 if attacked(position, lion.bit_length() - 1, 0) else 1
+
+# A game is a draw when the same position (the same pieces on the same squares
+# and in the same hands, with the same side to move) occurs for the
+# repetitions-th time. Positions are told apart by their keys (see
+# position.py).
+repetitions = 3
@@ -0,0 +1,192 @@
+# The following program writes a Position (see position.py) in two compact
+# forms and reads it back: a short line of text that a person can read and
+# type, and a single integer of at most 63 bits. Both forms hold the pieces on
+# the board, the pieces in each hand and the side to move, and the same
+# position always has the same text and the same integer, so either one can
+# be used as a key in a dictionary or a file, or sent between processes,
+# far more cheaply than the dictionary described in board.py.
+
+# Player B
+#    1  2  3
+# 1  G  L  E
+# 2  *  C  *
+# 3  *  c  *
+# 4  e  l  g
+# Player A
+
+# The text has three fields separated by spaces, as follows. The text of the
+# initial position above, with Player B to move, is 'GLE/1C1/1c1/elg B -'.
+
+# board : the ranks from 1 to 4 separated by '/', each written from file 1
+#         to file 3 with a letter for each piece (L, G, E, C or H in capitals
+#         for Player B's pieces and in lower case for Player A's pieces, as
+#         board_display.py shows them) and a digit for each run of empty
+#         squares.
+# side : the side to move, A or B.
+# hands : the letters of the pieces in Player B's hand then in Player A's
+#         hand, in the order L, G, E, C and written once for each piece, or
+#         '-' if both hands are empty. A lion in hand has been captured.
+
+# The integer is made of the following fields, from the least significant
+# bit.
+
+# cells : 4 bits for each of the 12 squares, 0 if the square is empty and
+#         1 + 5 * side + kind if it is occupied (48 bits).
+# hands : for Player A then Player B, 1 bit for the number of lions in hand
+#         and 2 bits each for the numbers of giraffes, elephants and chicks in
+#         hand (14 bits).
+# side : the side to move (1 bit).
+
+# The integer fits in one 64-bit word, for instance int.to_bytes(8, 'little')
+# gives it as 8 bytes.
+
+from position import Position, frompieces, topieces, mirror, sides, b, \
+                     L, G, E, C, H
+
+letters = 'LGECH'
+
+# The bits of each count in hand, and its position in the hand field of a
+# side.
+handbits = ((L, 1, 0), (G, 2, 1), (E, 2, 3), (C, 2, 5))
+
+def totext(position):
+    ranks = []
+    for rank in range(4):
+        text, empty = '', 0
+        for s in range(3 * rank, 3 * rank + 3):
+            cell = position.cells[s]
+            if cell == -1:
+                empty += 1
+                continue
+            if empty : text += str(empty)
+            empty = 0
+            letter = letters[cell % 5]
+            text += letter if cell // 5 == 1 else letter.lower()
+        if empty : text += str(empty)
+        ranks.append(text)
+
+    hands = ''
+    for side in (1, 0):
+        for kind in (L, G, E, C):
+            letter = letters[kind] if side == 1 else letters[kind].lower()
+            hands += letter * position.hands[side][kind]
+
+    return '/'.join(ranks) + ' ' + sides[position.side] + ' ' + (hands or '-')
+
+# Returns True if the pieces of the Position can be those of a game: each
+# lion is on the board or in the hand of the opponent (at most one of them
+# captured), and there are at most two giraffes, two elephants and two chicks
+# (counting the hens) on the board and in the hands.
+
+def possible(position):
+    masks, hands = position.masks, position.hands
+    count = lambda side, kind : bin(masks[side][kind]).count('1')
+    for side in (0, 1):
+        if count(side, L) + hands[1 - side][L] != 1 : return False
+    if hands[0][L] and hands[1][L] : return False
+    for kind in (G, E, C):
+        total = sum(count(side, kind) + hands[side][kind] for side in (0, 1))
+        if kind == C : total += count(0, H) + count(1, H)
+        if total > 2 : return False
+    return True
+
+# Returns the Position written as text by totext. Raises ValueError if the
+# text is not of that form, or if its pieces cannot be those of a game (see
+# possible).
+
+def fromtext(text):
+    fields = text.split()
+    if len(fields) != 3 or fields[1] not in sides:
+        raise ValueError('invalid position ' + repr(text))
+    board, side, hands = fields
+    position = Position(sides.index(side))
+
+    ranks = board.split('/')
+    if len(ranks) != 4:
+        raise ValueError('invalid position ' + repr(text))
+    for rank in range(4):
+        s = 3 * rank
+        for character in ranks[rank]:
+            if character in '123':
+                s += int(character)
+            elif character.upper() in letters and s < 3 * rank + 3:
+                position.place(int(character.isupper()),
+                               letters.index(character.upper()), s)
+                s += 1
+            else:
+                raise ValueError('invalid position ' + repr(text))
+        if s != 3 * rank + 3:
+            raise ValueError('invalid position ' + repr(text))
+
+    if hands != '-':
+        for character in hands:
+            side = int(character.isupper())
+            kind = 'LGEC'.find(character.upper())
+            if kind == -1 or position.hands[side][kind] == 2:
+                raise ValueError('invalid position ' + repr(text))
+            position.give(side, kind)
+
+    if not possible(position):
+        raise ValueError('invalid position ' + repr(text))
+    return position
+
+def topacked(position):
+    number = 0
+    for s in range(12):
+        number |= (position.cells[s] + 1) << 4 * s
+    for side in (0, 1):
+        for kind, bits, shift in handbits:
+            number |= position.hands[side][kind] << 48 + 7 * side + shift
+    return number | position.side << 62
+
+# Returns (number, flipped), where number is the smaller of the integers of
+# the Position and of its mirror image (see mirror in position.py), which
+# have the same score, and flipped is True if it is the integer of the
+# mirror image. Stores that keep one entry for both positions use number as
+# the key (and mirrormove in movegen.py to turn the moves of one position
+# into moves of the other when flipped is True).
+
+def canonical(position):
+    number = topacked(position)
+    other = topacked(mirror(position))
+    return (other, True) if other < number else (number, False)
+
+# Returns the Position packed into an integer by topacked. Raises ValueError
+# if the integer does not describe a position.
+
+def frompacked(number):
+    if number < 0 or number >> 63:
+        raise ValueError('invalid packed position ' + str(number))
+    position = Position(number >> 62)
+    for s in range(12):
+        cell = number >> 4 * s & 15
+        if cell > 10:
+            raise ValueError('invalid packed position ' + str(number))
+        if cell : position.place((cell - 1) // 5, (cell - 1) % 5, s)
+    for side in (0, 1):
+        for kind, bits, shift in handbits:
+            count = number >> 48 + 7 * side + shift & (1 << bits) - 1
+            if count > 2:
+                raise ValueError('invalid packed position ' + str(number))
+            for n in range(count):
+                position.give(side, kind)
+    return position
+
+# The same conversions for the dictionary described in board.py. The
+# dictionary does not record whose turn it is, so the side to move is given
+# to piecestotext and piecestopacked ('A' or 'B') and returned with the
+# dictionary by texttopieces and packedtopieces.
+
+def piecestotext(pieces, side = b):
+    return totext(frompieces(pieces, side))
+
+def texttopieces(text):
+    position = fromtext(text)
+    return (topieces(position), sides[position.side])
+
+def piecestopacked(pieces, side = b):
+    return topacked(frompieces(pieces, side))
+
+def packedtopieces(number):
+    position = frompacked(number)
+    return (topieces(position), sides[position.side])
@@ -0,0 +1,247 @@
+# The following program spreads the search of alphabeta.py over several
+# processes (one per CPU core by default), searching the moves of the root
+# node in parallel.
+
+# At each depth, the first move of the root (the best move of the previous
+# depth) is searched by the main process alone. Its score becomes the best
+# score so far (alpha), which is kept in shared memory. The other moves are
+# then handed out to the worker processes. Each worker reads the best score
+# so far when it starts a move, searches the move with a null window just
+# below it (which only tells whether the move is at least as good), searches
+# the move again with a full window if it is, and raises the best score so
+# far if the move is better. Since moves as good as the best move are always
+# searched with a full window, every move with the best score gets its exact
+# score, whatever the order in which the workers finish, and the move chosen
+# is the first move (in the order of the root) with the best score. So the
+# choice does not depend on which worker finishes first.
+
+# The pool of worker processes is created once (for instance, once per game)
+# and reused for every search, and each worker keeps its own transposition
+# table from one search to the next.
+
+# LazyPool searches in parallel differently (Lazy SMP): every process
+# searches the whole tree from the root, and the processes share one
+# transposition table (see sharedtable.py) instead of sharing the moves of
+# the root. The helper processes search one ply deeper every other process
+# and break ties between moves at random, so they search the moves in
+# different orders and fill the shared table with positions that the main
+# process then finds there instead of searching them. The move played is the
+# move found by the main process, and the helpers are stopped as soon as the
+# main process is done.
+
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from alphabeta import Search, Timeout, negamax, ordermoves, searchposition, \
+                      tablebasemove, winscore, maxdepth
+from movegen import legalmoves
+from sharedtable import SharedTable
+from tablebase import Tablebase
+from transposition import TranspositionTable
+
+# The value of the shared best score before any move has been searched.
+nobound = -2 ** 62
+
+# The state of a worker process: the shared best score, the transposition
+# table, the tablebase (None if there is none) and the number of the search
+# the transposition table was last used for.
+worker = {}
+
+def initworker(alpha, megabytes, tablebase):
+    worker['alpha'] = alpha
+    worker['table'] = TranspositionTable(megabytes)
+    worker['tablebase'] = Tablebase(tablebase) if tablebase else None
+    worker['search'] = None
+
+# Searches the given root move of the Position depth ply deep in a worker
+# process. Returns (score, exact, pv, nodes), where exact is False if the
+# score is only an upper bound (the move is worse than the best score so
+# far), or None if the time runs out first. history is the list of the keys
+# of the positions of the game (see searchposition in alphabeta.py).
+
+def searchmove(position, move, depth, deadline, number, history):
+    table = worker['table']
+    if worker['search'] != number:
+        table.newsearch()
+        worker['search'] = number
+    search = Search(table, deadline, worker['tablebase'], history = history)
+    shared = worker['alpha']
+
+    scout = shared.value - 1
+    search.path.add(position.key)
+    position.make(move)
+    try:
+        if scout < nobound:
+            scout = -math.inf
+            score = -negamax(position, depth - 1, -math.inf, math.inf, 1,
+                             search)
+        else:
+            score = -negamax(position, depth - 1, -scout - 1, -scout, 1,
+                             search)
+            if score > scout:
+                score = -negamax(position, depth - 1, -math.inf, -scout, 1,
+                                 search)
+    except Timeout:
+        return None
+
+    with shared.get_lock():
+        if score > shared.value : shared.value = score
+
+    return (score, score > scout, [move] + search.pv[1], search.nodes)
+
+class RootPool:
+
+    # workers is the number of worker processes (by default, the number of
+    # CPU cores), megabytes is the size of the transposition table of each
+    # process, and tablebase is the path of a tablebase file (see
+    # tablebase.py) or None.
+    def __init__(self, workers = None, megabytes = 16, tablebase = None):
+        self.alpha = multiprocessing.Value('q', nobound)
+        self.executor = ProcessPoolExecutor(workers, initializer = initworker,
+                            initargs = (self.alpha, megabytes, tablebase))
+        self.table = TranspositionTable(megabytes)
+        self.tablebase = Tablebase(tablebase) if tablebase else None
+        self.searches = 0
+        self.nodes = 0
+
+    # Returns (score, pv) for the side to move in the given Position, like
+    # the searchposition function in alphabeta.py (without randomization).
+    # The number of nodes searched by all processes is left in self.nodes.
+    def search(self, position, depth = None, movetime = None, history = None):
+        tablebase = self.tablebase
+        if tablebase is not None and tablebase.probe(position) is not None:
+            return tablebasemove(position, tablebase)
+
+        self.searches = self.searches + 1
+        self.nodes = 0
+        self.table.newsearch()
+        deadline = None
+        if movetime is not None : deadline = time.monotonic() + movetime / 1000
+        search = Search(self.table, deadline, tablebase, history = history)
+        search.path.add(position.key)
+
+        position = position.copy()
+        moves = legalmoves(position)
+        if not moves : return (-winscore, [])
+        score, pv = None, [None]
+
+        for ply in range(1, (depth or maxdepth) + 1):
+            ordermoves(position, moves, pv[0], 0, search)
+
+            # Search the first move in this process.
+            try:
+                undo = position.make(moves[0])
+                value = -negamax(position, ply - 1, -math.inf, math.inf, 1,
+                                 search)
+                position.unmake(undo)
+            except Timeout:
+                break
+            results = [(value, True, [moves[0]] + search.pv[1], 0)]
+
+            # Search the other moves in the worker processes.
+            self.alpha.value = value
+            futures = [self.executor.submit(searchmove, position, move, ply,
+                                            deadline, self.searches, history)
+                       for move in moves[1:]]
+            results.extend(future.result() for future in futures)
+
+            finished = [result for result in results if result is not None]
+            self.nodes += sum(result[3] for result in finished)
+            best = max(result[0] for result in finished if result[1])
+            for result in finished:
+                if result[1] and result[0] == best:
+                    score, pv = best, result[2]
+                    break
+
+            if len(finished) < len(results) : break
+            if abs(score) >= winscore // 2 : break
+
+        if pv[0] not in moves : pv = [moves[0]]
+        self.nodes += search.nodes
+
+        return (score, pv)
+
+    def close(self):
+        self.executor.shutdown()
+        if self.tablebase is not None : self.tablebase.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+# The state of a helper process of LazyPool: the shared transposition table,
+# the event that stops the helpers, and the tablebase (None if there is none).
+helper = {}
+
+def inithelper(name, stop, tablebase):
+    helper['table'] = SharedTable(name = name)
+    helper['stop'] = stop
+    helper['tablebase'] = Tablebase(tablebase) if tablebase else None
+
+# Searches the given Position from the root in a helper process, until the
+# depth or the time runs out or the helpers are stopped. Returns the number
+# of nodes searched.
+
+def helpsearch(position, depth, movetime, generation, history):
+    table = helper['table']
+    # searchposition starts the next generation of the table.
+    table.newsearch(generation - 1)
+    searchposition(position, depth, movetime, table, True,
+                   helper['tablebase'], helper['stop'], history = history)
+    return searchposition.nodes
+
+class LazyPool:
+
+    # workers is the number of processes (the main process and the helpers,
+    # by default the number of CPU cores), megabytes is the size of the
+    # shared transposition table, and tablebase is the path of a tablebase
+    # file (see tablebase.py) or None.
+    def __init__(self, workers = None, megabytes = 16, tablebase = None):
+        if workers is None : workers = multiprocessing.cpu_count()
+        self.helpers = max(workers - 1, 1)
+        self.table = SharedTable(megabytes)
+        self.stop = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(self.helpers,
+                            initializer = inithelper,
+                            initargs = (self.table.name, self.stop, tablebase))
+        self.tablebase = Tablebase(tablebase) if tablebase else None
+        self.nodes = 0
+
+    # Returns (score, pv) for the side to move in the given Position, like
+    # the searchposition function in alphabeta.py (without randomization).
+    # The number of nodes searched by all processes is left in self.nodes.
+    def search(self, position, depth = None, movetime = None, history = None):
+        tablebase = self.tablebase
+        if tablebase is not None and tablebase.probe(position) is not None:
+            return tablebasemove(position, tablebase)
+
+        generation = self.table.generation + 1
+        self.stop.clear()
+        futures = [self.executor.submit(helpsearch, position,
+                                        depth and depth + n % 2, movetime,
+                                        generation, history)
+                   for n in range(1, self.helpers + 1)]
+
+        score, pv = searchposition(position, depth, movetime, self.table,
+                                   tablebase = tablebase, history = history)
+        self.nodes = searchposition.nodes
+
+        self.stop.set()
+        self.nodes += sum(future.result() for future in futures)
+
+        return (score, pv)
+
+    def close(self):
+        self.executor.shutdown()
+        self.table.close()
+        if self.tablebase is not None : self.tablebase.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
@@ -0,0 +1,92 @@
+# The following program lets the search of alphabeta.py think on the user's
+# time (pondering). After the program plays its move, main.py waits for the
+# user to type a move, and the processor would sit idle. Instead, a
+# background thread searches the positions that the user's replies lead to,
+# starting with the reply that the search of the program's move expects (the
+# second move of its principal variation), so that when the user plays it,
+# the program's answer is ready at once. The other replies are searched in
+# turn, and every search fills the transposition table that the program's
+# next search uses, so even a reply that was not expected is answered after a
+# shorter search.
+
+# The thread is stopped (see Search in alphabeta.py) as soon as the program's
+# next search starts, so the two never use the transposition table at the
+# same time.
+
+import threading
+
+from alphabeta import searchposition
+from movegen import legalmoves, winner
+from notation import topacked
+from transposition import TranspositionTable
+
+class Ponderer:
+
+    # megabytes is the size of the transposition table, and tablebase is a
+    # Tablebase (see tablebase.py) or None.
+    def __init__(self, megabytes = 16, tablebase = None):
+        self.table = TranspositionTable(megabytes)
+        self.tablebase = tablebase
+        self.stop = threading.Event()
+        self.thread = None
+        self.results = {}
+
+    # Starts pondering in the given Position (the user is to move), where pv
+    # is the principal variation expected from it (pv[0] is the expected
+    # reply, if pv is not empty). Each reply is searched depth ply deep.
+    # history is the list of the keys of the positions of the game up to the
+    # Position, including it (see searchposition in alphabeta.py). The
+    # position after each reply is searched with its key added, so that
+    # the history is the one main.py gives the search when the user plays
+    # that reply, and the result is the same.
+    def start(self, position, pv, depth, history = None):
+        self.halt()
+        self.results = {}
+        if winner(position) is not None : return
+        self.stop.clear()
+        self.thread = threading.Thread(target = self.ponder,
+                                       args = (position.copy(), pv[:1], depth,
+                                               history),
+                                       daemon = True)
+        self.thread.start()
+
+    # Searches the position after each reply, the expected reply first, and
+    # records the result (depth, score, pv) of each search that is finished
+    # by its packed position (see notation.py).
+    def ponder(self, position, expected, depth, history = None):
+        moves = legalmoves(position)
+        if expected and expected[0] in moves:
+            moves.remove(expected[0])
+            moves.insert(0, expected[0])
+
+        for move in moves:
+            undo = position.make(move)
+            if winner(position) is None:
+                score, pv = searchposition(position, depth, None, self.table,
+                                           True, self.tablebase, self.stop,
+                                           history = list(history or ())
+                                                     + [position.key])
+                if self.stop.is_set() : return
+                self.results[topacked(position)] = (depth, score, pv)
+            position.unmake(undo)
+
+    # Stops pondering and waits for the thread to end.
+    def halt(self):
+        if self.thread is not None:
+            self.stop.set()
+            self.thread.join()
+            self.thread = None
+
+    # Returns (score, pv) for the side to move in the given Position, like
+    # the searchposition function in alphabeta.py (with randomization): the
+    # result of pondering if the Position was searched at least depth ply
+    # deep, and otherwise the result of a search that uses the transposition
+    # table filled by pondering.
+    def search(self, position, depth, movetime = None, stats = None,
+               history = None):
+        self.halt()
+        found = self.results.get(topacked(position))
+        if found is not None and found[0] >= depth : return found[1:]
+        return searchposition(position, depth, movetime, self.table, True,
+                              self.tablebase, stats = stats,
+                              history = history)
@@ -0,0 +1,316 @@
+# The following program gives a compact representation of a Dobutsu Shogi
+# position. The dictionary described in board.py is convenient to read and to
+# display, but every access to it involves string comparisons on the sides,
+# tuple comparisons on the squares and scans through nested lists. The search
+# in alphabeta.py visits a very large number of positions, so it works on the
+# Position class below instead and converts to and from the dictionary only
+# at its boundaries (see the frompieces and topieces functions).
+
+# Player B
+#    1  2  3
+# 1  G  L  E
+# 2  *  C  *
+# 3  *  c  *
+# 4  e  l  g
+# Player A
+
+from zobrist import boardkeys, handkeys, sidekey
+
+# Constants indicating the players involved.
+a, b = 'A', 'B'
+
+# Sides are given as indices in a Position: 0 is Player A and 1 is Player B,
+# so that sides[0] == a and sides[1] == b.
+sides = (a, b)
+
+# The types of the pieces are also given as indices. The letters match the
+# letters used for the pieces in the actions dictionary in board.py, and
+# kinds[L] == 'lion', kinds[G] == 'giraffe', etc. match the keys of the
+# dictionary described in board.py.
+L, G, E, C, H = 0, 1, 2, 3, 4
+kinds = ('lion', 'giraffe', 'elephant', 'chick', 'hen')
+
+# The twelve squares of the board are numbered 0 through 11 from top left to
+# bottom right, so square (i,j) of board.py is number 3 * (i - 1) + (j - 1).
+# Below is a reference.
+
+#    1   2   3
+# 1  0   1   2
+# 2  3   4   5
+# 3  6   7   8
+# 4  9  10  11
+
+def square(i, j):
+    return 3 * (i - 1) + (j - 1)
+
+def coordinates(s):
+    return (s // 3 + 1, s % 3 + 1)
+
+# The board and the way every piece moves are symmetric about file 2, so a
+# position and its mirror image (with files 1 and 3 swapped) have the same
+# score. mirrored[s] is the square that square s is swapped with.
+mirrored = [s - s % 3 + 2 - s % 3 for s in range(12)]
+
+# A set of squares is represented by a 12-bit integer (a mask) whose bit s is
+# set if and only if square s belongs to the set.
+full = (1 << 12) - 1
+
+# The value of each type of piece, in the order L, G, E, C, H, used by the
+# static evaluation (see evaluate.py). The lion has no value, since the game
+# is over when it is captured. advances[side][kind][s] is the number of ranks
+# a piece of the given side and type on square s has advanced from the back
+# rank of its side (where its lion starts) if it is a chick, and 0 otherwise.
+material = (0, 3, 3, 1, 4)
+advances = [[[(3 - s // 3 if side == 0 else s // 3) if kind == C else 0
+              for s in range(12)] for kind in range(5)] for side in range(2)]
+
+# A Position consists of the following.
+
+# masks : masks[side][kind] is the set of squares occupied by the pieces of
+#         the given type belonging to the given side.
+# hands : hands[side][kind] is the number of pieces of the given type in the
+#         hand of the given side. A lion in hand means that the lion has been
+#         captured. hands[side][H] is always 0 (a captured hen is a chick).
+# occupied : occupied[side] is the set of squares occupied by the pieces of
+#            the given side.
+# cells : cells[s] is -1 if square s is empty and 5 * side + kind if it is
+#         occupied by a piece of the given type belonging to the given side.
+# side : the side to move.
+# key : the Zobrist key of the position (see zobrist.py).
+# mirrorkey : the Zobrist key of the mirror image of the position (see
+#             mirror), so that a position and its mirror image can be
+#             stored once, under the smaller of the two keys.
+# counts : counts[side] is the number of pieces of the given side, on the
+#          board and in hand.
+# boardvalues : boardvalues[side] is the total value (see material) of the
+#               pieces of the given side on the board.
+# handvalues : handvalues[side] is the total value of the pieces in the hand
+#              of the given side.
+# advancement : advancement[side] is the total of advances over the pieces of
+#               the given side on the board.
+
+# masks and cells hold the same information. cells answers ''what is on this
+# square'' without looking through ten masks, and masks answer ''where are the
+# pieces of this type'' without looking through twelve squares. Both are kept
+# up to date by the four functions place, lift, give and take below, which are
+# the only functions that change the pieces of a Position. These functions
+# also update the key and the totals that follow it, each by the part that
+# the piece contributes, so neither the key nor the score skew and the static
+# evaluation of alphabeta.py (which read the totals) ever have to be computed
+# from scratch.
+
+class Position:
+
+    __slots__ = ('masks', 'hands', 'occupied', 'cells', 'side', 'key',
+                 'mirrorkey', 'counts', 'boardvalues', 'handvalues',
+                 'advancement')
+
+    def __init__(self, side = 1):
+        self.masks = [[0] * 5, [0] * 5]
+        self.hands = [[0] * 5, [0] * 5]
+        self.occupied = [0, 0]
+        self.cells = [-1] * 12
+        self.side = side
+        self.key = sidekey if side == 1 else 0
+        self.mirrorkey = self.key
+        self.counts = [0, 0]
+        self.boardvalues = [0, 0]
+        self.handvalues = [0, 0]
+        self.advancement = [0, 0]
+
+    # Put a piece of the given side and type on the empty square s.
+    def place(self, side, kind, s):
+        bit = 1 << s
+        self.masks[side][kind] |= bit
+        self.occupied[side] |= bit
+        self.cells[s] = 5 * side + kind
+        self.key ^= boardkeys[side][kind][s]
+        self.mirrorkey ^= boardkeys[side][kind][mirrored[s]]
+        self.counts[side] += 1
+        self.boardvalues[side] += material[kind]
+        self.advancement[side] += advances[side][kind][s]
+
+    # Remove the piece of the given side and type from square s.
+    def lift(self, side, kind, s):
+        bit = 1 << s
+        self.masks[side][kind] ^= bit
+        self.occupied[side] ^= bit
+        self.cells[s] = -1
+        self.key ^= boardkeys[side][kind][s]
+        self.mirrorkey ^= boardkeys[side][kind][mirrored[s]]
+        self.counts[side] -= 1
+        self.boardvalues[side] -= material[kind]
+        self.advancement[side] -= advances[side][kind][s]
+
+    # Add a piece of the given type to the hand of the given side.
+    def give(self, side, kind):
+        self.hands[side][kind] += 1
+        self.key ^= handkeys[side][kind][self.hands[side][kind]]
+        self.mirrorkey ^= handkeys[side][kind][self.hands[side][kind]]
+        self.counts[side] += 1
+        self.handvalues[side] += material[kind]
+
+    # Remove a piece of the given type from the hand of the given side.
+    def take(self, side, kind):
+        self.key ^= handkeys[side][kind][self.hands[side][kind]]
+        self.mirrorkey ^= handkeys[side][kind][self.hands[side][kind]]
+        self.hands[side][kind] -= 1
+        self.counts[side] -= 1
+        self.handvalues[side] -= material[kind]
+
+    # Perform a move on this Position (see movegen.py for how moves are
+    # represented) and hand the turn to the other side. Unlike the perform
+    # function in board_hardware.py, this function changes the Position
+    # itself instead of returning a modified copy. The move must be legal
+    # (one of the moves given by the legalmoves function of movegen.py). The
+    # return value is an undo record that unmake uses to take the move back,
+    # namely
+
+    # (kind, origin, target, occupant, promoted)
+
+    # where the first three entries are the move, occupant is what cells held
+    # on the target square before the move (so it gives the side and type of
+    # a captured piece; a captured hen went to the hand as a chick), and
+    # promoted is True if a chick was promoted to a hen.
+
+    def make(self, move):
+        kind, origin, target = move
+        side = self.side
+        occupant = self.cells[target]
+        promoted = False
+
+        if origin is None:
+            self.take(side, kind)
+            self.place(side, kind, target)
+
+        else:
+            if occupant != -1:
+                captured = occupant % 5
+                self.lift(1 - side, captured, target)
+                self.give(side, C if captured == H else captured)
+            self.lift(side, kind, origin)
+            # A chick that reaches the furthest rank is promoted to a hen.
+            if kind == C:
+                promoted = target < 3 if side == 0 else target > 8
+            self.place(side, H if promoted else kind, target)
+
+        self.side = 1 - side
+        self.key ^= sidekey
+        self.mirrorkey ^= sidekey
+        return (kind, origin, target, occupant, promoted)
+
+    # Take back the move described by an undo record returned by make. The
+    # move must be the last move made on this Position that was not taken
+    # back.
+
+    def unmake(self, undo):
+        kind, origin, target, occupant, promoted = undo
+        side = 1 - self.side
+        self.side = side
+        self.key ^= sidekey
+        self.mirrorkey ^= sidekey
+
+        if origin is None:
+            self.lift(side, kind, target)
+            self.give(side, kind)
+
+        else:
+            self.lift(side, H if promoted else kind, target)
+            self.place(side, kind, origin)
+            if occupant != -1:
+                captured = occupant % 5
+                self.take(side, C if captured == H else captured)
+                self.place(1 - side, captured, target)
+
+    # Returns the number of pieces (on the board and in hand) that belong to
+    # the given side.
+    def count(self, side):
+        return self.counts[side]
+
+    def copy(self):
+        other = Position.__new__(Position)
+        other.masks = [self.masks[0][:], self.masks[1][:]]
+        other.hands = [self.hands[0][:], self.hands[1][:]]
+        other.occupied = self.occupied[:]
+        other.cells = self.cells[:]
+        other.side = self.side
+        other.key = self.key
+        other.mirrorkey = self.mirrorkey
+        other.counts = self.counts[:]
+        other.boardvalues = self.boardvalues[:]
+        other.handvalues = self.handvalues[:]
+        other.advancement = self.advancement[:]
+        return other
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self.side == other.side \
+            and self.masks == other.masks and self.hands == other.hands
+
+# Returns the mirror image of the given Position (see mirrored), as a new
+# Position.
+
+def mirror(position):
+    other = Position(position.side)
+    for s in range(12):
+        cell = position.cells[s]
+        if cell != -1 : other.place(cell // 5, cell % 5, mirrored[s])
+    for side in (0, 1):
+        for kind in range(5):
+            for n in range(position.hands[side][kind]):
+                other.give(side, kind)
+    return other
+
+# Returns the Position represented by the dictionary described in board.py.
+# The dictionary does not record whose turn it is, so the side to move is
+# given as the second parameter ('A' or 'B').
+
+def frompieces(pieces, side = b):
+    position = Position(sides.index(side))
+
+    for kind in range(5):
+        for piece in pieces[kinds[kind]]:
+            if piece[0] is None:
+                continue
+            owner = sides.index(piece[0])
+            if piece[1] is None:
+                position.give(owner, kind)
+            else:
+                position.place(owner, kind, square(*piece[1]))
+
+    return position
+
+# Returns the dictionary described in board.py that represents the given
+# Position. Each type of piece gets its two entries in the following order:
+# Player A's pieces on the board, Player A's pieces in hand, Player B's pieces
+# on the board, Player B's pieces in hand, then entries that are not in play.
+# Lions are the exception, since capturewin in board.py expects the first
+# lion to be Player A's own lion and the second one to be Player B's own lion.
+# A side's own lion is never in its hand, so the lion that is on the board is
+# the side's own lion and the lion that is in a hand is the opponent's lion.
+
+def topieces(position):
+    pieces = {}
+
+    for kind in range(5):
+        entries = []
+        for side in (0, 1):
+            mask = position.masks[side][kind]
+            for s in range(12):
+                if mask >> s & 1:
+                    entries.append([sides[side], coordinates(s)])
+            for n in range(position.hands[side][kind]):
+                entries.append([sides[side], None])
+        while len(entries) < 2:
+            entries.append([None, None])
+        pieces[kinds[kind]] = tuple(entries)
+
+    lions = []
+    for side in (0, 1):
+        if position.masks[side][L]:
+            s = position.masks[side][L].bit_length() - 1
+            lions.append([sides[side], coordinates(s)])
+        else:
+            lions.append([sides[1 - side], None])
+    pieces['lion'] = tuple(lions)
+
+    return pieces
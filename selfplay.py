@@ -0,0 +1,236 @@
+# The following program plays games between two configurations of the
+# search of alphabeta.py, without a user, to measure whether a change to the
+# search (for instance one that makes it faster) costs playing strength.
+# Each configuration is a list of settings separated by commas, for instance
+# depth=5,movetime=1000,quiescence=0. The settings are the following.
+
+# depth : the depth of the search in ply (5 by default)
+# movetime : the time budget of each move in milliseconds (none by default)
+# quiescence : 1 to use the quiescence search, 0 not to (1 by default)
+# evaluation : 1 to use the static evaluation (see evaluate.py), 0 not to (1 by
+#              default)
+# megabytes : the size of the transposition table (16 by default)
+# book : the path of an opening book (see book.py)
+# tablebase : the path of a tablebase (see tablebase.py)
+
+# Usage: python selfplay.py depth=4 depth=5,quiescence=0 --plies 2 --rounds 10
+
+# The games start from the positions reached by every sequence of plies moves
+# from the initial position (Player B moving first), and each of them is
+# played twice in each round, with each configuration playing each side once
+# (to play more games than there are openings, play several rounds). The
+# moves are chosen at random among the best moves (see searchposition), with
+# a seed that depends only on the number of the game, so a run can be
+# repeated. A game is a draw when a position occurs for the third time (see
+# repetitions in movegen.py), and a game that is not over after maxplies ply
+# is a draw as well. The games are played in parallel on a pool of worker
+# processes (one per CPU core by default).
+
+# The program reports the wins, draws and losses of the first configuration
+# against the second, the difference of their Elo ratings with a 95%
+# confidence interval, and for each configuration the average time and
+# number of nodes of its moves.
+
+import argparse
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from alphabeta import searchposition
+from board import initialstate
+from book import Book
+from movegen import legalmoves, winner, repetitions
+from notation import totext, fromtext
+from position import frompieces
+from tablebase import Tablebase
+from transposition import TranspositionTable
+
+maxplies = 200
+
+defaults = {'depth' : 5, 'movetime' : None, 'quiescence' : 1,
+            'evaluation' : 1, 'megabytes' : 16, 'book' : None,
+            'tablebase' : None}
+
+# Returns the configuration described by a list of settings as a dictionary.
+# Raises ValueError if a setting is unknown.
+
+def parseconfig(text):
+    config = dict(defaults)
+    for setting in text.split(','):
+        if not setting : continue
+        name, equals, value = setting.partition('=')
+        if name not in defaults or not equals:
+            raise ValueError('invalid setting ' + setting)
+        config[name] = value if name in ('book', 'tablebase') else int(value)
+    return config
+
+# Returns the texts (see notation.py) of the positions reached by every
+# sequence of plies moves from the initial position, without repetitions,
+# leaving out the games that are already over.
+
+def openings(plies):
+    positions = {totext(frompieces(initialstate)) : None}
+    for ply in range(plies):
+        following = {}
+        for text in positions:
+            position = fromtext(text)
+            for move in legalmoves(position):
+                undo = position.make(move)
+                if winner(position) is None:
+                    following[totext(position)] = None
+                position.unmake(undo)
+        positions = following
+    return sorted(positions)
+
+# The books and tablebases opened by a worker process, by path.
+opened = {}
+
+def openfile(kind, path):
+    if path not in opened : opened[path] = kind(path)
+    return opened[path]
+
+# Plays a game from the given opening between two configurations, where
+# configs[side] plays the given side (see position.py). Returns (winner,
+# times, nodes, moves), where winner is the side that won (None for a draw)
+# and the other entries give the total time and nodes and the number of
+# moves of each side.
+
+def playgame(opening, configs, seed):
+    random.seed(seed)
+    position = fromtext(opening)
+    tables = [TranspositionTable(config['megabytes']) for config in configs]
+    times, nodes, moves = [0, 0], [0, 0], [0, 0]
+    history = []
+
+    for ply in range(maxplies):
+        win = winner(position)
+        if win is not None : return (win, times, nodes, moves)
+        history.append(position.key)
+        if history.count(position.key) >= repetitions:
+            return (None, times, nodes, moves)
+
+        side = position.side
+        config = configs[side]
+        start = time.perf_counter()
+        move = None
+        if config['book'] is not None:
+            move = openfile(Book, config['book']).choose(position)
+        if move is None:
+            tablebase = None
+            if config['tablebase'] is not None:
+                tablebase = openfile(Tablebase, config['tablebase'])
+            score, pv = searchposition(position, config['depth'],
+                                       config['movetime'], tables[side], True,
+                                       tablebase,
+                                       quiescence = bool(config['quiescence']),
+                                       evaluation = bool(config['evaluation']),
+                                       history = history)
+            move = pv[0]
+            nodes[side] += searchposition.nodes
+        times[side] += time.perf_counter() - start
+        moves[side] += 1
+        position.make(move)
+
+    return (winner(position), times, nodes, moves)
+
+# Returns the difference of Elo ratings that corresponds to the given score
+# (the fraction of the points won).
+
+def elo(score):
+    if score <= 0 : return -math.inf
+    if score >= 1 : return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+# Plays every opening twice in each round between configs (x, y), and
+# returns the list of tuples (opening, xside, result) where xside is the side
+# played by x and result is (winner, times, nodes, moves) from playgame.
+
+def match(x, y, plies = 2, rounds = 1, workers = None, report = None):
+    games = []
+    starts = openings(plies)
+    for n in range(rounds):
+        for opening in starts:
+            for xside in (0, 1):
+                games.append((opening, xside))
+
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        futures = {}
+        for number, (opening, xside) in enumerate(games):
+            configs = (x, y) if xside == 0 else (y, x)
+            future = executor.submit(playgame, opening, configs, number)
+            futures[future] = (opening, xside)
+        for future in as_completed(futures):
+            opening, xside = futures[future]
+            results.append((opening, xside, future.result()))
+            if report is not None : report(len(results), len(games))
+    return results
+
+# Returns the lines of the report described above.
+
+def summarize(results):
+    wins = draws = losses = 0
+    times, nodes, moves = [0, 0], [0, 0], [0, 0]
+    for opening, xside, (win, sidetimes, sidenodes, sidemoves) in results:
+        if win is None : draws += 1
+        elif win == xside : wins += 1
+        else : losses += 1
+        for side in (0, 1):
+            config = 0 if side == xside else 1
+            times[config] += sidetimes[side]
+            nodes[config] += sidenodes[side]
+            moves[config] += sidemoves[side]
+
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    # The standard error of the score of one game, then of the average.
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                           + losses * score ** 2) / games)
+    margin = 1.96 * deviation / math.sqrt(games)
+
+    lines = ['Games: %d  X wins: %d  draws: %d  X losses: %d'
+             % (games, wins, draws, losses),
+             'Score of X: %.1f%%  Elo difference: %+.0f (%+.0f, %+.0f)'
+             % (100 * score, elo(score), elo(score - margin),
+                elo(score + margin))]
+    for config, name in ((0, 'X'), (1, 'Y')):
+        count = max(moves[config], 1)
+        lines.append('%s: %.3f seconds and %.0f nodes per move'
+                     % (name, times[config] / count, nodes[config] / count))
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Play games between two '
+                                     + 'configurations of the Dobutsu Shogi '
+                                     + 'search.')
+    parser.add_argument('x', help = 'the first configuration, for instance '
+                        + 'depth=4,quiescence=1')
+    parser.add_argument('y', help = 'the second configuration')
+    parser.add_argument('--plies', type = int, default = 2,
+                        help = 'the number of ply of the openings')
+    parser.add_argument('--rounds', type = int, default = 1,
+                        help = 'the number of times each opening is played '
+                        + 'with each side')
+    parser.add_argument('--workers', type = int,
+                        help = 'the number of worker processes')
+    arguments = parser.parse_args()
+
+    try:
+        x, y = parseconfig(arguments.x), parseconfig(arguments.y)
+    except ValueError as error:
+        parser.error(str(error))
+
+    def report(done, total):
+        sys.stderr.write('\r%d/%d games' % (done, total))
+        sys.stderr.flush()
+
+    results = match(x, y, arguments.plies, arguments.rounds, arguments.workers,
+                    report)
+    sys.stderr.write('\n')
+    for line in summarize(results):
+        print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# The following program implements a transposition table (see
+# transposition.py) that several processes can use at the same time. The
+# entries are kept in a block of shared memory (multiprocessing.shared_memory)
+# as a flat array of 64-bit words, two words per entry, and every process
+# that attaches to the block reads and writes the same entries without any
+# lock.
+
+# The information of an entry (see transposition.py) is packed into one
+# 64-bit word, data, as follows (from the least significant bit).
+
+# score + 2 ** 31 : 32 bits
+# depth : 7 bits
+# flag : 2 bits
+# move (see encodemove in movegen.py) : 11 bits
+# generation (modulo 256) : 8 bits
+
+# The entry is stored as the two words key ^ data and data. A process may
+# read an entry while another process is writing it, and see one word of the
+# old entry and one word of the new entry. The exclusive or of the two words
+# is then not the key of either entry, so such an entry is not mistaken for
+# the entry of the position being looked up, and probe reports it as not
+# stored.
+
+# The replacement policy is the one of transposition.py.
+
+from multiprocessing import shared_memory
+
+from movegen import encodemove, decodemove
+
+# The number of bytes of one entry.
+entrysize = 16
+
+class SharedTable:
+
+    # Creates a table in a new block of shared memory, whose size is at most
+    # the given number of megabytes, or attaches to the block of an existing
+    # table if its name is given (the name of a table is self.name).
+    def __init__(self, megabytes = 16, name = None):
+        if name is None:
+            size = 1
+            while 2 * size * entrysize <= megabytes * 2 ** 20:
+                size = 2 * size
+            self.memory = shared_memory.SharedMemory(create = True,
+                                                     size = size * entrysize)
+            self.owner = True
+        else:
+            # Only the process that created the block removes it (see close).
+            self.memory = shared_memory.SharedMemory(name = name)
+            self.owner = False
+            size = self.memory.size // entrysize
+
+        self.name = self.memory.name
+        self.words = self.memory.buf.cast('Q')
+        self.mask = size - 1
+        self.generation = 0
+
+    # Call this function before every search. The processes searching
+    # together should be given the same generation.
+    def newsearch(self, generation = None):
+        if generation is None : generation = self.generation + 1
+        self.generation = generation
+
+    # Returns the entry (key, depth, flag, score, move, generation) of the
+    # position with the given key, or None if the position is not stored.
+    def probe(self, key):
+        index = 2 * (key & self.mask)
+        words = self.words
+        data = words[index + 1]
+        if words[index] ^ data != key or not data : return
+        return (key, data >> 32 & 127, data >> 39 & 3,
+                (data & 0xffffffff) - 2 ** 31, decodemove(data >> 41 & 2047),
+                data >> 52)
+
+    def store(self, key, depth, flag, score, move):
+        index = 2 * (key & self.mask)
+        words = self.words
+        old = words[index + 1]
+        generation = self.generation & 255
+        if old and old >> 52 == generation and depth < (old >> 32 & 127):
+            return
+        data = (score + 2 ** 31) | min(depth, 127) << 32 | flag << 39 \
+               | encodemove(move) << 41 | generation << 52
+        words[index] = key ^ data
+        words[index + 1] = data
+
+    def clear(self):
+        buffer = self.memory.buf
+        buffer[:] = bytes(len(buffer))
+
+    # Detaches from the block of shared memory, and removes the block if
+    # this process created it.
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner : self.memory.unlink()
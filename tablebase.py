@@ -0,0 +1,302 @@
+# The following program solves Dobutsu Shogi positions exactly by retrograde
+# analysis, writes the results to a file (a tablebase), and looks positions
+# up in such a file. A tablebase covers every position with a given material:
+# the two lions and the other pieces named by a string such as 'GC' (one
+# giraffe and one chick, where the chick may be promoted to a hen), each of
+# which may belong to either player and be on any square or in its owner's
+# hand, with either player to move. Pieces only change hands and chicks only
+# turn into hens and back, so the moves from such a position always lead to a
+# position with the same material (or win the game by capturing a lion).
+
+# A game starting from the initial position always has all eight pieces, so
+# only a tablebase for the material 'GGEECC' covers the positions of a real
+# game. Such a tablebase has hundreds of billions of entries and is out of
+# reach of this program; tablebases for smaller materials are meant for
+# endgame studies and positions set up for analysis.
+
+# Usage: python tablebase.py GC gc.tb
+
+# The result of a position for the player to move is stored in one byte.
+
+# 0 : the index does not describe a position (two pieces on one square)
+# 1 : draw (neither player can force a win)
+# 2 + 2 * d : the player to move wins in d ply
+# 3 + 2 * d : the player to move loses in d ply
+
+# A position where a player has already won (see the winner function in
+# movegen.py) is won or lost in 0 ply. Distances longer than maxdistance ply
+# are stored as maxdistance.
+
+# A position and its mirror image (see mirror in position.py) have the same
+# result, so only the positions where Player A's lion is on file 1 or 2 are
+# numbered: a position where it is on file 3 is looked up as its mirror
+# image, which takes a third of the positions out of the file.
+
+# The positions are numbered by mixed-radix indices. The digits are, from
+# the least significant: the side to move (2 values), the square of Player
+# A's lion (8: 2 * (i - 1) + (j - 1) for square (i,j) on file 1 or 2), the
+# square of Player B's lion (12), then one digit for each piece of the
+# material: owner * 13 + location for a giraffe or an elephant, where the
+# location is a square or 12 for the hand, and owner * 25 + location for a
+# chick, where the location is a square (chick), 12 + a square (hen), or 24
+# for the hand.
+
+# The file starts with a header of 16 bytes (magic, the material padded with
+# spaces to 8 bytes, and the number of positions as a 4-byte little-endian
+# integer) followed by one byte per position. Tablebase opens the file with
+# mmap, so that every program that probes the same tablebase shares one copy
+# of it in memory.
+
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+
+from movegen import legalmoves, winner
+from position import Position, mirror, L, G, E, C, H
+
+magic = b'DST2'
+maxdistance = 126
+
+radices = {G : 26, E : 26, C : 50}
+letters = {'G' : G, 'E' : E, 'C' : C}
+
+# Returns the list of piece types named by a material string, in the order of
+# their digits in the index.
+
+def materialkinds(material):
+    return sorted(letters[letter] for letter in material)
+
+def tablesize(kinds):
+    size = 2 * 8 * 12
+    for kind in kinds:
+        size = size * radices[kind]
+    return size
+
+# Returns the Position with the given index, or None if the index does not
+# describe a position.
+
+def decode(index, kinds):
+    position = Position(index % 2)
+    index = index // 2
+    digit = index % 8
+    lions = (3 * (digit // 2) + digit % 2, index // 8 % 12)
+    index = index // 96
+    if lions[0] == lions[1] : return
+
+    position.place(0, L, lions[0])
+    position.place(1, L, lions[1])
+
+    for kind in kinds:
+        digit = index % radices[kind]
+        index = index // radices[kind]
+        owner, location = divmod(digit, radices[kind] // 2)
+        if location == radices[kind] // 2 - 1:
+            position.give(owner, kind)
+            continue
+        if location >= 12:
+            kind, location = H, location - 12
+        if position.cells[location] != -1 : return
+        position.place(owner, kind, location)
+
+    return position
+
+# Returns the index of the given Position (or of its mirror image if Player
+# A's lion is on file 3), or None if the Position does not have the given
+# material (or if a lion has been captured).
+
+def encode(position, kinds):
+    masks, hands = position.masks, position.hands
+    if not masks[0][L] or not masks[1][L] : return
+    if masks[0][L] & 0b100100100100:
+        position = mirror(position)
+        masks, hands = position.masks, position.hands
+
+    digits = {G : [], E : [], C : []}
+    for kind in (G, E, C, H):
+        for owner in (0, 1):
+            mask = masks[owner][kind]
+            while mask:
+                s = (mask & -mask).bit_length() - 1
+                mask &= mask - 1
+                if kind == H:
+                    digits[C].append(owner * 25 + 12 + s)
+                else:
+                    digits[kind].append(owner * (radices[kind] // 2) + s)
+            if kind != H:
+                for n in range(hands[owner][kind]):
+                    digits[kind].append(owner * (radices[kind] // 2)
+                                        + radices[kind] // 2 - 1)
+
+    index, scale = position.side, 2
+    lion = masks[0][L].bit_length() - 1
+    index += scale * (2 * (lion // 3) + lion % 3)
+    index += scale * 8 * (masks[1][L].bit_length() - 1)
+    scale = scale * 96
+
+    for kind in (G, E, C):
+        digits[kind].sort()
+    for kind in kinds:
+        if not digits[kind] : return
+        index += scale * digits[kind].pop(0)
+        scale = scale * radices[kind]
+    if digits[G] or digits[E] or digits[C] : return
+
+    return index
+
+# Solves every position with the given material and returns the results as a
+# bytearray (one byte per index, as described above). Pass n finds the
+# positions won or lost in n ply from the results of the previous pass: a
+# position is won in n ply if a move leads to a position lost in n - 1 ply,
+# and lost in n ply if every move leads to a won position, the longest of
+# which is won in n - 1 ply. The positions that are still unresolved when a
+# pass finds nothing new are draws.
+
+def solve(material, report = None):
+    kinds = materialkinds(material)
+    size = tablesize(kinds)
+    results = bytearray(size)
+
+    # The children of each unresolved position (-1 stands for a move that
+    # captures a lion) are kept in one flat array.
+    unresolved = array('l')
+    starts = array('l')
+    children = array('l')
+
+    for index in range(size):
+        position = decode(index, kinds)
+        if position is None : continue
+        win = winner(position)
+        if win is not None:
+            results[index] = 2 if win == position.side else 3
+            continue
+        results[index] = 1
+        unresolved.append(index)
+        starts.append(len(children))
+        for move in legalmoves(position):
+            if position.cells[move[2]] % 5 == L:
+                children.append(-1)
+                continue
+            undo = position.make(move)
+            children.append(encode(position, kinds))
+            position.unmake(undo)
+    starts.append(len(children))
+
+    distance = 0
+    while unresolved:
+        distance = distance + 1
+        stored = min(distance, maxdistance)
+        updates = []
+        remaining = array('l')
+        remainingstarts = array('l')
+
+        for n in range(len(unresolved)):
+            index = unresolved[n]
+            lost = True
+            won = False
+            for child in children[starts[n]:starts[n + 1]]:
+                if child == -1 : won = True; break
+                value = results[child]
+                if value == 1:
+                    lost = False
+                elif value & 1 and (value - 3) // 2 == min(distance - 1,
+                                                           maxdistance):
+                    won = True
+                    break
+                elif value & 1:
+                    lost = False
+            if won:
+                updates.append((index, 2 + 2 * stored))
+            elif lost:
+                updates.append((index, 3 + 2 * stored))
+            else:
+                remaining.append(n)
+
+        if not updates : break
+        for index, value in updates:
+            results[index] = value
+
+        # Keep only the unresolved positions for the next pass.
+        kept, keptstarts, keptchildren = array('l'), array('l'), array('l')
+        for n in remaining:
+            kept.append(unresolved[n])
+            keptstarts.append(len(keptchildren))
+            keptchildren.extend(children[starts[n]:starts[n + 1]])
+        keptstarts.append(len(keptchildren))
+        unresolved, starts, children = kept, keptstarts, keptchildren
+
+        if report is not None : report(distance, len(updates), len(unresolved))
+
+    return results
+
+# Writes the results of solve to a file.
+
+def write(path, material, results):
+    header = magic + material.ljust(8).encode('ascii') \
+             + struct.pack('<I', len(results))
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.write(results)
+
+# A tablebase opened for probing. The file is memory-mapped read-only.
+
+class Tablebase:
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        if self.data[:4] != magic:
+            raise ValueError(path + ' is not a tablebase')
+        self.material = self.data[4:12].decode('ascii').strip()
+        self.kinds = materialkinds(self.material)
+        self.counts = (self.kinds.count(G), self.kinds.count(E),
+                       self.kinds.count(C))
+
+    # Returns True if the Position has the material of this tablebase. This
+    # only counts pieces, so it is cheap enough to call at every node.
+    def covers(self, position):
+        masks, hands = position.masks, position.hands
+        count = lambda kind : bin(masks[0][kind] | masks[1][kind]).count('1') \
+                              + hands[0][kind] + hands[1][kind]
+        return (count(G), count(E), count(C) + count(H)) == self.counts
+
+    # Returns (result, distance) for the player to move in the Position,
+    # where result is 1 for a win, 0 for a draw and -1 for a loss, and
+    # distance is the number of ply to the end of the game (0 for a draw).
+    # Returns None if the Position is not covered by this tablebase.
+    def probe(self, position):
+        if not self.covers(position) : return
+        index = encode(position, self.kinds)
+        if index is None : return
+        value = self.data[16 + index]
+        if value < 2 : return (0, 0)
+        return (-1 if value & 1 else 1, (value - 2) // 2)
+
+    def close(self):
+        self.data.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Build a Dobutsu Shogi '
+                                     + 'tablebase by retrograde analysis.')
+    parser.add_argument('material', help = 'the pieces besides the lions, '
+                        + 'for instance GC (letters G, E and C)')
+    parser.add_argument('output', help = 'the file to write')
+    arguments = parser.parse_args()
+
+    material = ''.join(sorted(arguments.material.upper()))
+    if not material or any(letter not in letters for letter in material) \
+       or len(material) > 6:
+        parser.error('invalid material ' + arguments.material)
+
+    print('Positions: ' + str(tablesize(materialkinds(material))))
+    def report(distance, found, left):
+        print('Distance ' + str(distance) + ': ' + str(found)
+              + ' positions resolved, ' + str(left) + ' left')
+        sys.stdout.flush()
+
+    results = solve(material, report)
+    write(arguments.output, material, results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# The following program implements a transposition table for the alpha-beta
+# pruning algorithm in alphabeta.py. In Dobutsu Shogi the same position is
+# often reached by different orders of moves (and drops), so the search
+# remembers what it has learned about a position, keyed by the Zobrist key of
+# the position (see zobrist.py), and reuses it when the position is reached
+# again.
+
+# Each entry of the table records the following for one position.
+
+# key : the Zobrist key of the position.
+# depth : the search depth the position was searched to.
+# flag : exact if score is the score of the position, lowerbound if the score
+#        of the position is at least score (the search was cut off), and
+#        upperbound if the score of the position is at most score (no move
+#        reached alpha).
+# score : the score found by the search.
+# move : the best move found by the search (None if there is none).
+# generation : the number of the search that stored the entry.
+
+# The table has a fixed number of entries determined by the memory cap given
+# when the table is created, and a position can only be stored in the entry
+# given by the low bits of its key. When two positions compete for the same
+# entry, the new position replaces the old one if the old entry was stored by
+# an earlier search (see newsearch) or if the new position was searched at
+# least as deeply. Deep entries save the most work, and entries from earlier
+# searches are the least likely to be needed again.
+
+# A position and its mirror image (see mirror in position.py) have the same
+# score, so probeposition and storeposition below keep a single entry for
+# both, under the smaller of their two keys, with the best move written for
+# the position that has that key. They work with any table that has the probe
+# and store functions below (for instance the table of sharedtable.py).
+
+from movegen import mirrormove
+
+exact, lowerbound, upperbound = 0, 1, 2
+
+# An estimate of the number of bytes used by one entry of the table (the
+# tuple holding the entry, the integers in it, and the slot of the list that
+# refers to it).
+entrysize = 128
+
+class TranspositionTable:
+
+    def __init__(self, megabytes = 16):
+        # The number of entries is the largest power of two that fits in the
+        # memory cap, so that the index of a key is a bit mask away.
+        size = 1
+        while 2 * size * entrysize <= megabytes * 2 ** 20:
+            size = 2 * size
+
+        self.mask = size - 1
+        self.entries = [None] * size
+        self.generation = 0
+
+    # Call this function before every search. Entries stored by earlier
+    # searches are kept for probing but are the first to be replaced.
+    def newsearch(self):
+        self.generation = self.generation + 1
+
+    # Returns the entry (key, depth, flag, score, move, generation) of the
+    # position with the given key, or None if the position is not stored.
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+
+    def store(self, key, depth, flag, score, move):
+        index = key & self.mask
+        old = self.entries[index]
+        if old is None or old[5] != self.generation or depth >= old[1]:
+            self.entries[index] = (key, depth, flag, score, move,
+                                   self.generation)
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+
+# Returns the entry (see probe) of the given Position, or of its mirror image
+# with the best move turned back into a move of the Position.
+
+def probeposition(table, position):
+    if position.key <= position.mirrorkey : return table.probe(position.key)
+    entry = table.probe(position.mirrorkey)
+    if entry is not None:
+        return entry[:4] + (mirrormove(entry[4]),) + entry[5:]
+
+def storeposition(table, position, depth, flag, score, move):
+    if position.key <= position.mirrorkey:
+        table.store(position.key, depth, flag, score, move)
+    else:
+        table.store(position.mirrorkey, depth, flag, score, mirrormove(move))
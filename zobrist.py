@@ -0,0 +1,33 @@
+# The following program gives the random numbers used to hash positions
+# (Zobrist hashing). The key of a Position in position.py is the exclusive or
+# of the following numbers.
+
+# boardkeys[side][kind][s] : for every piece of the given side and type on
+#                            square s.
+# handkeys[side][kind][n] : for n = 1, 2, ..., hands[side][kind], so that
+#                           the key depends on how many pieces of each type
+#                           are in each hand.
+# sidekey : if Player B is the side to move.
+
+# Since the exclusive or of a number with itself is zero, the key is updated
+# in constant time whenever a piece is placed on or lifted from a square,
+# added to or removed from a hand, or whenever the side to move changes.
+
+# The numbers are 64-bit and generated from a fixed seed, so the same
+# position has the same key in every run of the program.
+
+import random
+
+generator = random.Random(20210301)
+
+def number():
+    return generator.getrandbits(64)
+
+boardkeys = [[[number() for s in range(12)] for kind in range(5)]
+             for side in range(2)]
+
+# A side has at most two pieces of any type in hand.
+handkeys = [[[0] + [number() for n in range(2)] for kind in range(5)]
+            for side in range(2)]
+
+sidekey = number()